@@ -0,0 +1,239 @@
+import collections
+import datetime
+import json
+import os
+import threading
+
+import numpy as np
+
+import data_store
+
+
+###################################################################################################################
+# Price Alerts
+###################################################################################################################
+
+ALERTS_FILE = 'alerts.json'
+RECENT_TRIGGERS = 50 # triggered alerts kept for the sidebar
+
+# kind -> metric the rule watches. `level` compares against a fixed value, `ma` against the n-day moving average
+# of the close and `avg_volume` against multiplier x the n-day average volume
+KINDS = {
+    'level': 'price',
+    'ma': 'price',
+    'avg_volume': 'volume',
+}
+DIRECTIONS = ['above', 'below']
+
+
+def describe(rule):
+    if rule['kind'] == 'level':
+        target = rule['value']
+    elif rule['kind'] == 'ma':
+        target = '{}-day MA'.format(rule['window'])
+    else:
+        target = '{}x {}-day avg volume'.format(rule['multiplier'], rule['window'])
+    return '{} {} crosses {} {}'.format(rule['symbol'], KINDS[rule['kind']], rule['direction'], target)
+
+
+class AlertEngine:
+    """Evaluates alert rules against incoming quotes.
+
+    Active rules are grouped per (symbol, metric, direction) into a threshold array sorted ascending, with the
+    matching rule ids alongside. A tick moving a metric from `previous` to `value` can only trigger thresholds
+    between the two, so each group costs two binary searches plus the rules that actually fire, regardless of
+    how many rules exist. Rules fire once and are then disarmed.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or data_store.cache_path(ALERTS_FILE)
+        self.rules = {}
+        self.triggered = collections.deque(maxlen=RECENT_TRIGGERS)
+        self._groups = {}
+        self._dirty = True
+        self._version = 0 # bumped by every rule change, tells a threshold build whether it is already out of date
+        self._previous = {}
+        self._thresholds_date = None
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (IOError, OSError, ValueError):
+            saved = {}
+        self.rules = {rule['id']: rule for rule in saved.get('rules', [])}
+        self.triggered.extend(saved.get('triggered', []))
+        self._next_id = max(self.rules, default=0) + 1
+
+    def _save(self):
+        # Write to a temporary file first so a crash never leaves a half written rule set behind
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'rules': list(self.rules.values()), 'triggered': list(self.triggered)}, f)
+        os.replace(tmp, self.path)
+
+    def add_rule(self, symbol, kind, direction, value=None, window=None, multiplier=None):
+        return self.add_rules([dict(symbol=symbol, kind=kind, direction=direction, value=value, window=window,
+                                    multiplier=multiplier)])[0]
+
+    def add_rules(self, specs):
+        """Add one rule per dict of add_rule arguments, writing the rules file once for the whole batch."""
+        specs = list(specs)
+        for spec in specs:
+            if spec['kind'] not in KINDS or spec['direction'] not in DIRECTIONS:
+                raise ValueError('Unknown alert kind or direction: {} {}'.format(spec['kind'], spec['direction']))
+        with self._lock:
+            added = []
+            for spec in specs:
+                rule = {'id': self._next_id, 'symbol': spec['symbol'], 'kind': spec['kind'],
+                        'direction': spec['direction'], 'value': spec.get('value'), 'window': spec.get('window'),
+                        'multiplier': spec.get('multiplier'), 'triggered_at': None}
+                self._next_id += 1
+                self.rules[rule['id']] = rule
+                added.append(rule)
+            self._changed()
+            self._save()
+            return added
+
+    def remove_rule(self, rule_id):
+        with self._lock:
+            self.rules.pop(rule_id, None)
+            self._changed()
+            self._save()
+
+    def _changed(self):
+        # Called with _lock held after rules were added or removed
+        self._version += 1
+        self._dirty = True
+
+    def symbols(self):
+        return set(rule['symbol'] for rule in self.rules.values() if rule['triggered_at'] is None)
+
+    def rules_for(self, symbol):
+        return [rule for rule in self.rules.values() if rule['symbol'] == symbol]
+
+    def _threshold(self, rule, history):
+        if rule['kind'] == 'level':
+            return rule['value']
+        if rule['kind'] == 'ma':
+            return history['Close'].iloc[-rule['window']:].mean()
+        # Average volume of the completed sessions before today
+        completed = history[history.index < history.index[-1]] if len(history) > 1 else history
+        return completed['Volume'].iloc[-rule['window']:].mean() * rule['multiplier']
+
+    def _stale(self):
+        return self._dirty or self._thresholds_date != datetime.date.today()
+
+    def _build_groups(self):
+        # Resolve derived thresholds (moving averages, average volume) once per day and sort them per group.
+        # Loading histories can mean a download, so it runs outside _lock and ticks keep using the old groups
+        with self._build_lock:
+            with self._lock:
+                if not self._stale():
+                    return # built by another thread while this one waited
+                version = self._version
+                armed = [dict(rule) for rule in self.rules.values() if rule['triggered_at'] is None]
+            grouped = self._resolve(armed)
+
+            with self._lock:
+                # Rules removed or fired during the build are left out
+                still_armed = set(rule_id for rule_id, rule in self.rules.items() if rule['triggered_at'] is None)
+                self._groups = {}
+                for key, entries in grouped.items():
+                    entries = sorted(entry for entry in entries if entry[1] in still_armed)
+                    self._groups[key] = (np.array([t for t, _ in entries], dtype='float64'),
+                                         np.array([i for _, i in entries], dtype='int64'))
+                self._thresholds_date = datetime.date.today()
+                self._dirty = self._version != version # rules added during the build need another one
+
+    def _resolve(self, rules):
+        # (symbol, metric, direction) -> [(threshold, rule id)] for the given rules
+        grouped = collections.defaultdict(list)
+        histories = {}
+        for rule in rules:
+            symbol = rule['symbol']
+            if rule['kind'] != 'level' and symbol not in histories:
+                try:
+                    histories[symbol] = data_store.load_history(symbol)
+                except Exception:
+                    histories[symbol] = None
+            history = histories.get(symbol)
+            if rule['kind'] != 'level' and (history is None or history.empty):
+                continue
+            threshold = self._threshold(rule, history)
+            grouped[(symbol, KINDS[rule['kind']], rule['direction'])].append((threshold, rule['id']))
+        return grouped
+
+    def tick(self, symbol, price=None, volume=None):
+        """Feed a new price and/or volume for symbol. Returns the rules that fired."""
+        if self._stale():
+            self._build_groups()
+        fired = []
+        with self._lock:
+            for metric, value in (('price', price), ('volume', volume)):
+                if value is None:
+                    continue
+                previous = self._previous.get((symbol, metric))
+                self._previous[(symbol, metric)] = value
+                if previous is None:
+                    continue
+
+                above = self._groups.get((symbol, metric, 'above'))
+                if above is not None and value > previous:
+                    # previous < threshold <= value
+                    lo = np.searchsorted(above[0], previous, side='right')
+                    hi = np.searchsorted(above[0], value, side='right')
+                    fired.extend(self._fire((symbol, metric, 'above'), lo, hi))
+
+                below = self._groups.get((symbol, metric, 'below'))
+                if below is not None and value < previous:
+                    # value <= threshold < previous
+                    lo = np.searchsorted(below[0], value, side='left')
+                    hi = np.searchsorted(below[0], previous, side='left')
+                    fired.extend(self._fire((symbol, metric, 'below'), lo, hi))
+
+            if fired:
+                self._save()
+        return fired
+
+    def _fire(self, key, lo, hi):
+        if hi <= lo:
+            return []
+        thresholds, ids = self._groups[key]
+        now = datetime.datetime.now().isoformat(timespec='seconds')
+        fired = []
+        for rule_id in ids[lo:hi]:
+            rule = self.rules.get(int(rule_id))
+            if rule is None:
+                continue
+            rule['triggered_at'] = now
+            self.triggered.appendleft({'id': rule['id'], 'message': describe(rule), 'triggered_at': now})
+            fired.append(rule)
+        # Disarm the fired rules by cutting them out of the sorted arrays
+        self._groups[key] = (np.delete(thresholds, np.s_[lo:hi]), np.delete(ids, np.s_[lo:hi]))
+        return fired
+
+    def on_quotes(self, quotes):
+        # Listener for the quote poller: every published quote is a tick
+        for symbol, quote in quotes.items():
+            self.tick(symbol, quote.get('regularMarketPrice'), quote.get('regularMarketVolume'))
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine(poller=None):
+    # The process wide engine, loaded from the alerts file on first use. Passing the quote poller makes it poll
+    # every symbol with an armed rule and feed each published quote into the engine
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = AlertEngine()
+        if poller is not None:
+            poller.add_listener(_engine.on_quotes)
+            poller.watch('alerts', _engine.symbols())
+        return _engine
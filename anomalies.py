@@ -0,0 +1,86 @@
+import argparse
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import data_store
+import memory_cache
+import returns_matrix
+
+
+###################################################################################################################
+# Unusual Activity
+###################################################################################################################
+
+WINDOW = 20 # trading days of history the latest session is compared against
+MIN_OBSERVATIONS = 10
+ANOMALIES_FILE = 'anomalies.pkl'
+
+_cache = memory_cache.LRUCache('anomalies')
+
+
+def _zscores(block, window):
+    # z-score of the last row of block against the `window` rows before it, for every column at once
+    latest = block[-1].astype('float64')
+    history = np.asarray(block[-window - 1:-1], dtype='float64')
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        mean = np.nanmean(history, axis=0)
+        std = np.nanstd(history, axis=0, ddof=1)
+    enough = (~np.isnan(history)).sum(axis=0) >= MIN_OBSERVATIONS
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z = (latest - mean) / std
+    return np.where(enough & (std > 0), z, np.nan), latest
+
+
+def scan(matrix=None, window=WINDOW):
+    """Rank every symbol in the universe by how unusual its latest session was.
+
+    Volume is compared on a log scale so a handful of huge days does not swamp the baseline. Gaps are scored
+    against the symbol's own recent close-to-close volatility. The whole universe is scored in one vectorised
+    pass over the memory-mapped matrices, and the ranked list is cached per matrix build.
+    """
+    matrix = matrix or returns_matrix.ReturnsMatrix()
+    key = (matrix.build_id, window)
+    cached = _cache.get(key)
+    if cached is not memory_cache.MISSING:
+        return cached
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_volume = np.log(np.asarray(matrix.volume[-window - 1:], dtype='float64'))
+    log_volume[~np.isfinite(log_volume)] = np.nan
+    volume_z, _ = _zscores(log_volume, window)
+
+    gaps = np.asarray(matrix.gaps[-1], dtype='float64')
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        volatility = np.nanstd(np.asarray(matrix.values[-window - 1:-1], dtype='float64'), axis=0, ddof=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        gap_z = np.where(volatility > 0, gaps / volatility, np.nan)
+
+    ranked = pd.DataFrame({
+        'Symbol': matrix.symbols,
+        'Volume': np.asarray(matrix.volume[-1], dtype='float64'),
+        'Volume Z': volume_z,
+        'Gap': gaps,
+        'Gap Z': gap_z,
+        'Return': np.asarray(matrix.values[-1], dtype='float64'),
+    })
+    ranked['Score'] = np.fmax(np.abs(ranked['Volume Z']), np.abs(ranked['Gap Z']))
+    ranked = ranked.dropna(subset=['Score']).sort_values('Score', ascending=False).reset_index(drop=True)
+    ranked.insert(1, 'Date', pd.Timestamp(matrix.dates[-1]))
+
+    return _cache.put(key, ranked)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Rank the universe by unusual volume and price gaps.')
+    parser.add_argument('--window', type=int, default=WINDOW, help='trading days in the baseline')
+    args = parser.parse_args()
+
+    start_exec = time.time()
+    ranked = scan(window=args.window)
+    ranked.to_pickle(data_store.cache_path(ANOMALIES_FILE))
+    print("Scanned {} symbols in {} seconds".format(len(ranked), round(time.time() - start_exec, 2)))
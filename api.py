@@ -0,0 +1,227 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+import data_store
+import memory_cache
+import risk_metrics
+import screener
+import telemetry
+
+
+###################################################################################################################
+# Data API
+###################################################################################################################
+
+ARROW_TYPE = 'application/vnd.apache.arrow.stream'
+UNIVERSE_TTL = data_store.HISTORY_TTL
+GZIP_MIN_BYTES = 1024 # smaller bodies are sent as is, compressing them costs more than it saves
+
+
+class NotFound(Exception):
+    pass
+
+
+def _history_version(symbol):
+    # Stored history version, refreshing the store first once it is older than the app's refresh interval
+    version = data_store.history_version(symbol)
+    if version is None or time.time() - version > data_store.HISTORY_TTL:
+        data_store.refresh_history(symbol)
+        version = data_store.history_version(symbol)
+    return version
+
+
+_universe = {'loaded': None, 'table': None}
+_snapshots = {'version': None, 'table': None}
+_lock = threading.Lock()
+
+
+def _universe_version():
+    with _lock:
+        if _universe['loaded'] is None or time.time() - _universe['loaded'] > UNIVERSE_TTL:
+            _universe['table'] = data_store.load_universe()
+            _universe['loaded'] = time.time()
+        return _universe['loaded']
+
+
+def _snapshot_table():
+    # Snapshot table from the screener batch job indexed by Symbol, re-read only when the job rewrites it
+    try:
+        version = os.path.getmtime(data_store.cache_path(screener.SNAPSHOT_FILE))
+    except OSError:
+        raise NotFound('no snapshots yet, run `python screener.py`')
+    with _lock:
+        if version != _snapshots['version']:
+            table = screener.load_snapshots()
+            _snapshots['table'] = table.drop_duplicates('Symbol').set_index('Symbol')
+            _snapshots['version'] = version
+        return _snapshots['version'], _snapshots['table']
+
+
+def _date(params, name):
+    value = params.get(name)
+    return pd.Timestamp(value).date() if value else None
+
+
+# Each endpoint is (version, build). version(symbol, params) is cheap and changes whenever the data behind the
+# response does. build(symbol, params) returns the response as a DataFrame and only runs on a cache miss
+def _universe_frame(symbol, params):
+    return _universe['table']
+
+
+def _snapshot_version(symbol, params):
+    return _snapshot_table()[0]
+
+
+def _snapshot_frame(symbol, params):
+    table = _snapshot_table()[1]
+    if symbol not in table.index:
+        raise NotFound('no snapshot for %s' % symbol)
+    return table.loc[[symbol]].reset_index()
+
+
+def _history_frame(symbol, params):
+    bars = data_store.load_history(symbol, _date(params, 'start'), _date(params, 'end'), params.get('adjusted', '1') != '0')
+    if bars.empty:
+        raise NotFound('no history for %s' % symbol)
+    return bars.rename_axis('Date').reset_index()
+
+
+def _indicators_version(symbol, params):
+    return (_history_version(symbol), _history_version(risk_metrics.BENCHMARK))
+
+
+def _window(params):
+    return int(params.get('window', risk_metrics.TRADING_DAYS))
+
+
+def _risk_frame(symbol, params):
+    metrics, _ = risk_metrics.compute_risk_metrics(symbol, _window(params))
+    return pd.DataFrame([dict(metrics, Symbol=symbol)])
+
+
+def _indicators_frame(symbol, params):
+    _, rolling = risk_metrics.compute_risk_metrics(symbol, _window(params))
+    return rolling.rename_axis('Date').reset_index()
+
+
+ENDPOINTS = {
+    'universe': (lambda symbol, params: _universe_version(), _universe_frame),
+    'snapshot': (_snapshot_version, _snapshot_frame),
+    'history': (lambda symbol, params: _history_version(symbol), _history_frame),
+    'risk': (_indicators_version, _risk_frame),
+    'indicators': (_indicators_version, _indicators_frame),
+}
+
+
+def encode_json(frame):
+    return frame.to_json(orient='records', date_format='iso').encode('utf-8')
+
+
+def encode_arrow(frame):
+    # Arrow IPC stream so clients can map the columns without parsing. pyarrow is optional
+    import pyarrow as pa
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+# Encoded bodies keyed by request and stored under the ETag they were built for. A hit costs the endpoint's
+# version check and a dictionary lookup, repeated requests never touch pandas
+_responses = memory_cache.LRUCache('api_responses')
+
+
+def _etag(key, version):
+    return '"%s"' % hashlib.md5(repr((key, version)).encode('utf-8')).hexdigest()
+
+
+class Handler(BaseHTTPRequestHandler):
+    """GET /<endpoint>[/<symbol>] with optional start, end, adjusted, window and format query parameters.
+
+    Responses are JSON records by default or an Arrow IPC stream with format=arrow or an Arrow Accept header.
+    Every response carries an ETag and a matching If-None-Match gets 304 Not Modified without a body.
+    """
+
+    protocol_version = 'HTTP/1.1' # keep-alive, clients polling many symbols reuse one connection
+    disable_nagle_algorithm = True # headers and body go out in separate writes, don't hold the body back
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split('/') if p]
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        if parts == ['cache']:
+            # Size and hit/miss/eviction counters of every in-process cache, never cached itself
+            return self._send(200, encode_json(memory_cache.stats()), 'application/json')
+        if parts == ['metrics']:
+            # Stage latency histograms and cache counters for a Prometheus scrape
+            return self._send(200, telemetry.render().encode('utf-8'), 'text/plain; version=0.0.4')
+        if not parts or parts[0] not in ENDPOINTS or len(parts) != (1 if parts[0] == 'universe' else 2):
+            return self._send(404, b'{"error": "unknown endpoint"}', 'application/json')
+
+        arrow = params.pop('format', None) == 'arrow' or ARROW_TYPE in self.headers.get('Accept', '')
+        endpoint = parts[0]
+        symbol = parts[1].upper() if len(parts) > 1 else None
+        key = (endpoint, symbol, tuple(sorted(params.items())), arrow)
+        version, build = ENDPOINTS[endpoint]
+
+        try:
+            etag = _etag(key, version(symbol, params))
+            if etag in self.headers.get('If-None-Match', ''):
+                return self._send(304, b'', etag=etag)
+
+            body = _responses.get(key, etag)
+            if body is memory_cache.MISSING:
+                frame = build(symbol, params)
+                body = _responses.put(key, encode_arrow(frame) if arrow else encode_json(frame), etag)
+        except NotFound as e:
+            return self._send(404, json.dumps({'error': str(e)}).encode('utf-8'), 'application/json')
+        except ImportError:
+            return self._send(406, b'{"error": "Arrow output needs pyarrow installed"}', 'application/json')
+        except Exception as e:
+            return self._send(500, json.dumps({'error': str(e)}).encode('utf-8'), 'application/json')
+
+        encoding = None
+        if len(body) >= GZIP_MIN_BYTES and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            # Compressed once per body, the first time a client asks for it
+            body = _responses.cached(key + ('gzip',), lambda: gzip.compress(body, compresslevel=6), etag)
+            encoding = 'gzip'
+        self._send(200, body, ARROW_TYPE if arrow else 'application/json', etag, encoding)
+
+    def _send(self, status, body, content_type=None, etag=None, encoding=None):
+        self.send_response(status)
+        if content_type:
+            self.send_header('Content-Type', content_type)
+        if etag:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache') # always revalidate, the ETag makes that cheap
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Vary', 'Accept, Accept-Encoding')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # one line per request would dominate the cost of a cache hit
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Serve cached history, snapshots and indicators over HTTP.')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8502)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.daemon_threads = True
+    print("Serving the data API on http://{}:{}".format(args.host, args.port))
+    server.serve_forever()
@@ -0,0 +1,134 @@
+import argparse
+import datetime
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+import charts
+import data_store
+import risk_metrics
+import ticker_summary
+
+
+###################################################################################################################
+# Batch Reports
+###################################################################################################################
+
+REPORTS_DIR = 'reports'
+
+
+def _write_extracts(tickerDf, folder):
+    # CSV always, Parquet as well when pyarrow is installed
+    tickerDf.to_csv(os.path.join(folder, 'history.csv'), index_label='Date')
+    try:
+        tickerDf.to_parquet(os.path.join(folder, 'history.parquet'))
+    except ImportError:
+        return ['history.csv']
+    return ['history.csv', 'history.parquet']
+
+
+def build_report(symbol, start_date, end_date, out_dir, adjusted=True):
+    """Write one ticker's report to out_dir/<symbol> using the same data and chart code as the web app.
+
+    The folder holds summary.csv (Ticker Summary values), risk.csv, yearly.csv, the price history extracts and
+    one HTML file per chart, plus notes.txt naming any section that could not be built. Returns (symbol, files
+    written, error message or None).
+    """
+    folder = os.path.join(out_dir, symbol.replace('/', '_').replace('^', '_'))
+    os.makedirs(folder, exist_ok=True)
+    files = []
+    try:
+        info = data_store.load_info(symbol)
+        summary = ticker_summary.get_summary(info)
+        pd.Series(summary, name=symbol).to_csv(os.path.join(folder, 'summary.csv'), header=True)
+        files.append('summary.csv')
+
+        tickerDf = data_store.load_history(symbol, start_date, end_date, adjusted)
+        if tickerDf.empty:
+            return symbol, files, 'no price history'
+        files += _write_extracts(tickerDf, folder)
+
+        # Too little history for the risk numbers doesn't fail the report. Missing sections are listed in notes.txt
+        notes = []
+        try:
+            metrics, _ = risk_metrics.compute_risk_metrics(symbol)
+            pd.Series(metrics, name=symbol).to_csv(os.path.join(folder, 'risk.csv'), header=True)
+            files.append('risk.csv')
+        except Exception as e:
+            notes.append('Risk metrics unavailable: {}'.format(e))
+        try:
+            yearly = risk_metrics.yearly_statistics(symbol)
+            yearly[(yearly.index >= start_date.year) & (yearly.index <= end_date.year)].to_csv(os.path.join(folder, 'yearly.csv'))
+            files.append('yearly.csv')
+        except Exception as e:
+            notes.append('Yearly statistics unavailable: {}'.format(e))
+        if notes:
+            with open(os.path.join(folder, 'notes.txt'), 'w') as f:
+                f.write('\n'.join(notes) + '\n')
+            files.append('notes.txt')
+
+        data = charts.chart_data(charts.prepare_history(tickerDf, info.get('symbol', symbol)))
+        for title, build_chart in charts.CHARTS:
+            name = title.split(' (')[0].lower().replace(' ', '_') + '.html'
+            build_chart(data).save(os.path.join(folder, name))
+            files.append(name)
+    except Exception as e:
+        return symbol, files, str(e)
+    return symbol, files, None
+
+
+def write_index(results, out_dir):
+    # One page linking every report file, with failures listed at the end
+    rows = []
+    for symbol, files, error in sorted(results, key=lambda r: r[0]):
+        folder = symbol.replace('/', '_').replace('^', '_')
+        links = ' | '.join('<a href="{0}/{1}">{1}</a>'.format(folder, f) for f in files)
+        rows.append('<tr><td>{}</td><td>{}</td><td>{}</td></tr>'.format(symbol, links, error or ''))
+    with open(os.path.join(out_dir, 'index.html'), 'w') as f:
+        f.write('<html><body><h1>Stock Reports</h1><p>Generated {}</p><table>{}</table></body></html>'.format(
+            datetime.datetime.now().strftime('%Y-%m-%d %H:%M'), ''.join(rows)))
+
+
+def run_reports(symbols, start_date, end_date, out_dir, workers=None, adjusted=True):
+    # Every report needs the benchmark, so fetch it once here instead of in each worker
+    data_store.refresh_history(risk_metrics.BENCHMARK)
+    symbols = list(dict.fromkeys(symbols)) # a repeated symbol would have two workers writing the same folder
+    os.makedirs(out_dir, exist_ok=True)
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(build_report, symbol, start_date, end_date, out_dir, adjusted) for symbol in symbols]
+        for future in as_completed(futures):
+            symbol, files, error = future.result()
+            print("{}: {}".format(symbol, error or '{} files'.format(len(files))))
+            results.append((symbol, files, error))
+    write_index(results, out_dir)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Write static reports (tables, charts, data extracts) for a list of tickers.')
+    parser.add_argument('symbols', nargs='*', help='ticker symbols, e.g. AAPL MSFT')
+    parser.add_argument('--file', help='text file with one ticker symbol per line')
+    parser.add_argument('--start', type=lambda s: datetime.datetime.strptime(s, '%Y-%m-%d').date(),
+                        default=datetime.date(2019, 1, 1), help='first date, YYYY-MM-DD')
+    parser.add_argument('--end', type=lambda s: datetime.datetime.strptime(s, '%Y-%m-%d').date(),
+                        default=datetime.date.today(), help='last date, YYYY-MM-DD')
+    parser.add_argument('--out', default=data_store.cache_path(REPORTS_DIR), help='output folder')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--unadjusted', action='store_true', help='as traded prices instead of split/dividend adjusted')
+    args = parser.parse_args()
+
+    symbols = list(args.symbols)
+    if args.file:
+        with open(args.file) as f:
+            symbols += [line.strip() for line in f if line.strip()]
+    if not symbols:
+        parser.error('give ticker symbols or --file')
+
+    start_exec = time.time()
+    results = run_reports(symbols, args.start, args.end, args.out, args.workers, not args.unadjusted)
+    failed = sum(1 for _, _, error in results if error)
+    print("Wrote {} reports ({} failed) to {} in {} seconds".format(len(results), failed, args.out, round(time.time() - start_exec, 2)))
@@ -0,0 +1,153 @@
+import altair as alt
+import pandas as pd
+
+import data_store
+import memory_cache
+import telemetry
+
+
+###################################################################################################################
+# Ticker Charts
+###################################################################################################################
+
+def prepare_history(tickerDf, symbol):
+    # Compact bars plus the ticker as a one-category column. Date and Year are derived from the index when drawn
+    tickerDf = data_store.compact(tickerDf)
+    tickerDf['Ticker'] = pd.Categorical([symbol] * len(tickerDf))
+    return tickerDf
+
+
+def chart_data(tickerDf):
+    """Frame handed to Altair: the compact bars plus Date, Year and Ticker columns, built only to draw them."""
+    chart = tickerDf.drop(columns='Ticker')
+    chart['Date'] = chart.index
+    chart['Year'] = pd.DatetimeIndex(chart.index).year
+    chart['Ticker'] = tickerDf['Ticker'].astype(str)
+    return chart
+
+
+def _hover_layers(tickerDf, base, field):
+    # Nearest point highlight, value label and vertical rule that follow the mouse along Date
+    nearest = alt.selection(type='single', nearest=True, on='mouseover', fields=['Date'], empty='none')
+
+    selectors = alt.Chart(tickerDf).mark_point().encode(
+        x="Date:T",
+        opacity=alt.value(0),
+    ).add_selection(
+        nearest
+    )
+
+    points = base.mark_point().encode(
+        opacity=alt.condition(nearest, alt.value(1), alt.value(0))
+    )
+
+    text = base.mark_text(align='center', dx=5, dy=-5).encode(
+        text=alt.condition(nearest, field, alt.value(' '))
+    )
+
+    rules = alt.Chart(tickerDf).mark_rule(color='gray').encode(
+        x="Date:T",
+    ).transform_filter(
+        nearest
+    )
+
+    # Put the five layers into a chart and bind the data
+    return alt.layer(
+        base, selectors, points, rules, text
+        ).interactive()
+
+
+def closing_price_chart(tickerDf):
+    line = alt.Chart(tickerDf).mark_line(interpolate='basis').encode(
+        x=alt.X("Date:T", axis=alt.Axis(title='')),
+        y=alt.X('Close:Q', axis=alt.Axis(title='')),
+        color=alt.Color('Year:Q'),
+        tooltip=['Ticker:N', 'Date:T', 'Close:Q']
+    )
+    return _hover_layers(tickerDf, line, 'Close:Q')
+
+
+def volume_chart(tickerDf):
+    bar = alt.Chart(tickerDf).mark_bar(interpolate='basis').encode(
+        x=alt.X("Date:T", axis=alt.Axis(title='')),
+        y=alt.X('Volume:Q', axis=alt.Axis(format='#', title='')),
+        color=alt.Color('Year:Q'),
+        tooltip=['Ticker:N', 'Date:T', 'Year:Q', 'Volume:Q']
+    )
+    return _hover_layers(tickerDf, bar, 'Volume:Q')
+
+
+def volume_price_chart(tickerDf):
+    return alt.Chart(tickerDf).mark_circle(size=60).encode(
+        x=alt.X("Volume:Q", axis=alt.Axis(title='')),
+        y=alt.X('Close:Q', axis=alt.Axis(title='')),
+        color='Year:Q',
+        tooltip=['Ticker:N', 'Date:T', 'Year:Q', 'Volume:Q', 'Close:Q']
+    )
+
+
+def candlestick_chart(tickerDf):
+    base = alt.Chart(tickerDf).encode(
+        alt.X('Date:T', axis=alt.Axis(labelAngle=0, title='')),
+        color=alt.condition("datum.Open <= datum.Close", alt.value("#06982d"), alt.value("#ae1325")),
+        tooltip=['Ticker:N', 'Date:T', 'Open:Q', 'High:Q', 'Low:Q', 'Close:Q']
+    )
+
+    return alt.layer(
+        base.mark_rule().encode(alt.Y('Low:Q', title='', scale=alt.Scale(zero=False)),
+                                alt.Y2('High')),
+        base.mark_bar().encode(alt.Y('Open:Q', title=''),
+                               alt.Y2('Close')),
+    ).interactive()
+
+
+_tickers = memory_cache.LRUCache('ticker_charts')
+_specs = memory_cache.LRUCache('chart_specs')
+
+
+def ticker_charts(symbol, start_date, end_date, adjusted=True):
+    """Compact bars for one symbol and date range, ready for chart_data().
+
+    Memoised on (symbol, start, end, adjusted) and the stored history version, so a rerun caused by an
+    unrelated widget reuses them instead of reloading the history. Only the compact form is kept, the chart
+    frame is derived from it when drawing.
+    """
+    data_store.refresh_history(symbol, start_date) # cheap unless new bars are due
+    key = (symbol, start_date, end_date, adjusted)
+    version = data_store.history_version(symbol)
+    with telemetry.span('derive', symbol=symbol) as span:
+        span['cache'] = 'hit'
+        tickerDf = _tickers.get(key, version)
+        if tickerDf is memory_cache.MISSING:
+            span['cache'] = 'miss'
+            tickerDf = prepare_history(data_store.load_history(symbol, start_date, end_date, adjusted), symbol)
+            tickerDf = _tickers.put(key, tickerDf, version)
+        span['bytes'] = memory_cache.sizeof(tickerDf)
+    return tickerDf
+
+
+# (title, builder) for every chart on the ticker page, in display order. Builders take chart_data() output.
+# Every encoding in them spells out its field type (Date:T, Close:Q, ...) so chart_specs() can compile them
+# against a named dataset, without a frame to infer the types from. They are the types Altair infers from
+# chart_data()
+CHARTS = [
+    ('Closing Price', closing_price_chart),
+    ('Volume', volume_chart),
+    ('Volume x Price', volume_price_chart),
+    ('Candlesticks (OHLC)', candlestick_chart),
+]
+
+
+DATASET = 'ticker' # name the compiled specs use for chart_data()
+
+
+def chart_specs():
+    """Compiled Vega-Lite spec of every chart in CHARTS, with the data left out as the named dataset DATASET.
+
+    The specs do not depend on the ticker, so they are built and serialised once per Altair theme and shared
+    by every session and symbol. Pass chart_data() output as datasets={DATASET: data} when drawing them.
+    """
+    theme = alt.themes.active
+    with telemetry.span('chart_build', theme=theme) as span:
+        return _specs.cached(theme, telemetry.on_miss(span, lambda: [(title, build_chart(alt.NamedData(name=DATASET)).to_dict())
+                                                                   for title, build_chart in CHARTS]))
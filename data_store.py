@@ -0,0 +1,289 @@
+import datetime
+import os
+import time
+import pandas as pd
+import yfinance as yf
+
+import memory_cache
+import shared_cache
+import telemetry
+from paths import cache_path # re-exported, the other modules reach the cache directory through data_store
+
+
+###################################################################################################################
+# Local Data Store
+###################################################################################################################
+
+UNIVERSE_URL = 'https://raw.githubusercontent.com/ericttran3/yfinance-web-scraper/main/data/nasdaq-stock-tickers.csv'
+UNIVERSE_TTL = 24 * 60 * 60 # the listing changes a few times a week at most
+INFO_TTL = 60 * 60 # matches the app's hourly refresh
+
+# Fundamentals shown in the Ticker Summary, keyed by the provider's `info` field name
+SNAPSHOT_FIELDS = [
+    'regularMarketPrice', 'previousClose', 'regularMarketDayHigh', 'regularMarketDayLow',
+    'fiftyTwoWeekHigh', 'fiftyTwoWeekLow', '52WeekChange', 'SandP52WeekChange',
+    'fiftyDayAverage', 'twoHundredDayAverage', 'marketCap', 'beta',
+    'trailingPE', 'trailingEps', 'pegRatio', 'priceToSalesTrailing12Months',
+    'priceToBook', 'enterpriseToRevenue', 'enterpriseToEbitda', 'profitMargins',
+    'netIncomeToCommon', 'payoutRatio', 'dividendRate', 'dividendYield',
+    'forwardEps', 'forwardPE', 'earningsQuarterlyGrowth', 'regularMarketVolume',
+    'averageVolume', 'averageVolume10days', 'sharesOutstanding', 'floatShares',
+    'heldPercentInsiders', 'heldPercentInstitutions', 'sharesShort', 'shortRatio',
+    'shortPercentOfFloat', 'sharesShortPriorMonth',
+]
+
+# Fields the provider reports as fractions but the app displays as percentages
+PERCENT_FIELDS = [
+    '52WeekChange', 'SandP52WeekChange', 'profitMargins', 'payoutRatio', 'dividendYield',
+    'earningsQuarterlyGrowth', 'heldPercentInsiders', 'heldPercentInstitutions', 'shortPercentOfFloat',
+]
+
+
+def load_universe():
+    # NASDAQ stock list with Symbol, Name, Sector, Industry and Market Cap for every listed company
+    with telemetry.span('universe') as span:
+        universe = shared_cache.cached('universe', telemetry.on_miss(span, lambda: pd.read_csv(UNIVERSE_URL)), ttl=UNIVERSE_TTL)
+        span['bytes'] = memory_cache.sizeof(universe)
+    return universe
+
+
+_infos = memory_cache.LRUCache('info')
+
+
+def load_info(symbol):
+    # The provider's `info` payload for symbol, fetched at most once per INFO_TTL across all processes
+    key = ('info', symbol)
+    with telemetry.span('info', symbol=symbol) as span:
+        # A miss here means the provider was asked, not just that the in-process copy was missing
+        fetch = telemetry.on_miss(span, lambda: yf.Ticker(symbol).info)
+        info = _infos.cached(key, lambda: shared_cache.cached(key, fetch, ttl=INFO_TTL), ttl=INFO_TTL)
+        span['bytes'] = memory_cache.sizeof(info)
+    return info
+
+
+def info_is_cached(symbol):
+    # True when load_info can answer without asking the provider
+    key = ('info', symbol)
+    if _infos.contains(key, ttl=INFO_TTL):
+        return True
+    return shared_cache.get(key, ttl=INFO_TTL) is not shared_cache.MISSING
+
+
+def fetch_snapshot(symbol):
+    # Pull one `info` payload and keep only the numeric fundamentals. Missing or non-numeric values become None
+    try:
+        info = load_info(symbol)
+    except Exception:
+        info = {}
+
+    snapshot = {'Symbol': symbol}
+    for field in SNAPSHOT_FIELDS:
+        value = info.get(field)
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            value = None
+        elif field in PERCENT_FIELDS:
+            value = value * 100
+        snapshot[field] = value
+    return snapshot
+
+
+###################################################################################################################
+# Price History
+###################################################################################################################
+
+HISTORY_START = datetime.date(2010, 1, 1)
+HISTORY_TTL = 60 * 60 # seconds before the stored history is checked for new bars again, matches the app's hourly refresh
+
+
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close']
+ACTION_COLUMNS = ['Dividends', 'Stock Splits']
+FACTOR_COLUMNS = ['Split Factor', 'Dividend Factor']
+
+
+def _history_file(symbol):
+    return cache_path('history', '%s.pkl' % symbol.replace('/', '_').replace('^', '_'))
+
+
+def fetch_history(symbol, start, end=None):
+    # Daily bars straight from the provider. Prices and volume are split adjusted, dividends are not applied
+    df = yf.Ticker(symbol).history(period='1d', start=start, end=end, auto_adjust=False, actions=True)
+    df.index = pd.DatetimeIndex(df.index).tz_localize(None)
+    for column in ACTION_COLUMNS:
+        if column not in df.columns:
+            df[column] = 0.0
+    return df[~df.index.duplicated(keep='last')]
+
+
+def _as_traded(df):
+    """Undo the provider's split adjustment so stored prices never change after they are written.
+
+    Returns the raw OHLCV bars with neutral adjustment factors and the corporate actions found in df, with
+    dividends also in as-traded terms.
+    """
+    splits = df['Stock Splits'].replace(0, 1).fillna(1)
+    # Product of the split ratios strictly after each bar
+    later_splits = splits[::-1].cumprod()[::-1].shift(-1, fill_value=1)
+
+    bars = df[PRICE_COLUMNS + ['Volume']].astype('float64')
+    bars[PRICE_COLUMNS] = bars[PRICE_COLUMNS].mul(later_splits, axis=0)
+    bars['Volume'] = bars['Volume'] / later_splits
+    for column in FACTOR_COLUMNS:
+        bars[column] = 1.0
+
+    actions = df.loc[(df['Dividends'] != 0) | (df['Stock Splits'] != 0), ACTION_COLUMNS].astype('float64')
+    actions['Dividends'] = actions['Dividends'] * later_splits[actions.index]
+    return bars, actions
+
+
+def _apply_actions(bars, actions):
+    # Fold each action into the cumulative factors of every bar before its ex-date. One vectorised update per action
+    for date, action in actions.sort_index().iterrows():
+        before = bars.index < date
+        if not before.any():
+            continue
+        if action['Stock Splits']:
+            bars.loc[before, 'Split Factor'] *= action['Stock Splits']
+        if action['Dividends']:
+            previous_close = bars.loc[before, 'Close'].iloc[-1]
+            bars.loc[before, 'Dividend Factor'] *= 1 - action['Dividends'] / previous_close
+    return bars
+
+
+_stores = memory_cache.LRUCache('history')
+
+
+def _read_store(symbol):
+    # Parsed stores are kept in memory keyed on the file's mtime, so the pickle is only read again after a write
+    path = _history_file(symbol)
+    try:
+        version = os.path.getmtime(path)
+        store = _stores.get(symbol, version)
+        if store is memory_cache.MISSING:
+            store = _stores.put(symbol, pd.read_pickle(path), version)
+    except (IOError, OSError, EOFError):
+        return None
+    if not isinstance(store, dict) or store['bars'].empty:
+        return None
+    return store
+
+
+def _write_store(symbol, store):
+    # Write next to the target and rename so readers never see a half written file
+    path = _history_file(symbol)
+    pd.to_pickle(store, path + '.tmp')
+    os.replace(path + '.tmp', path)
+
+
+def adjust(bars, actions, adjusted=True):
+    """Bars with Dividends and Stock Splits columns, either as traded or split and dividend adjusted.
+
+    Adjusted prices are raw * Dividend Factor / Split Factor and adjusted volume is raw * Split Factor, the
+    same convention the provider uses for its adjusted close.
+    """
+    out = bars[PRICE_COLUMNS + ['Volume']].copy()
+    events = actions.reindex(bars.index).fillna(0)
+    out['Dividends'] = events['Dividends']
+    out['Stock Splits'] = events['Stock Splits']
+    if adjusted:
+        out[PRICE_COLUMNS] = out[PRICE_COLUMNS].mul(bars['Dividend Factor'] / bars['Split Factor'], axis=0)
+        out['Volume'] = out['Volume'] * bars['Split Factor']
+        out['Dividends'] = out['Dividends'] / bars['Split Factor']
+    return out
+
+
+def _is_current(symbol, store, start):
+    # True when the store covers start and was checked for new bars within HISTORY_TTL. A last bar dated today
+    # doesn't make the store current: it may have been saved intraday and is re-fetched like any other
+    if store is None or start < store['start']:
+        return False
+    return time.time() - os.path.getmtime(_history_file(symbol)) <= HISTORY_TTL
+
+
+def _update_store(symbol, store, start):
+    # Full reload when nothing usable is stored, otherwise fetch only the bars after the last stored one
+    if store is None or start < store['start']:
+        start = min(start, pd.Timestamp(HISTORY_START))
+        bars, actions = _as_traded(fetch_history(symbol, start=start.date()))
+        store = {'start': start, 'bars': _apply_actions(bars, actions), 'actions': actions}
+        _write_store(symbol, store)
+    else:
+        # Re-fetch the last stored bar as well, its close may have been intraday when it was saved
+        store = dict(store) # the cached copy may be in use by other sessions
+        bars, actions = store['bars'], store['actions']
+        df = fetch_history(symbol, start=bars.index[-1].date())
+        if not df.empty:
+            fresh, fresh_actions = _as_traded(df)
+            new_actions = fresh_actions[~fresh_actions.index.isin(actions.index)]
+            bars = pd.concat([bars[bars.index < fresh.index[0]], fresh])
+            store['bars'] = _apply_actions(bars, new_actions)
+            store['actions'] = pd.concat([actions, new_actions]).sort_index()
+        _write_store(symbol, store)
+    return store
+
+
+def refresh_history(symbol, start=None):
+    """Bring the stored bars and corporate-action ledger for symbol up to date and return the store.
+
+    Only bars from the last stored date onwards are downloaded. A new split or dividend in that window updates
+    the adjustment factors of the earlier bars in place, so older history is never downloaded again. A start
+    date earlier than anything requested before triggers a full reload from that date.
+    """
+    start = pd.Timestamp(start or HISTORY_START)
+    with telemetry.span('history', symbol=symbol) as span:
+        span['cache'] = 'hit'
+        store = _read_store(symbol)
+        if _is_current(symbol, store, start):
+            return store
+
+        # One process downloads, the others wait and then read what it wrote
+        with shared_cache.lock(('history', symbol)):
+            store = _read_store(symbol)
+            if not _is_current(symbol, store, start):
+                span['cache'] = 'miss'
+                store = _update_store(symbol, store, start)
+                span['bytes'] = memory_cache.sizeof(store['bars'])
+    return store
+
+
+def history_is_current(symbol, start=None):
+    # True when load_history can answer from the local store without downloading
+    return _is_current(symbol, _read_store(symbol), pd.Timestamp(start or HISTORY_START))
+
+
+def load_history(symbol, start=None, end=None, adjusted=True):
+    """Daily bars for symbol between start and end, served from the local store.
+
+    Prices are split and dividend adjusted by default. Pass adjusted=False for the prices as they traded.
+    """
+    store = refresh_history(symbol, start)
+    start = pd.Timestamp(start or HISTORY_START)
+    bars = store['bars'][store['bars'].index >= start]
+    if end is not None:
+        bars = bars[bars.index < pd.Timestamp(end)]
+    return adjust(bars, store['actions'], adjusted)
+
+
+def compact(bars):
+    """Copy of load_history output holding only the prices and volume, in the smallest dtypes that keep them exact.
+
+    Prices stay float64 so charted values are unchanged. Volume becomes whole shares in an unsigned integer,
+    uint32 unless some day traded more than 4.29 billion shares. The action columns, which no chart reads,
+    are left out.
+    """
+    out = bars[PRICE_COLUMNS].astype('float64')
+    volume = bars['Volume'].fillna(0).clip(lower=0).round()
+    out['Volume'] = volume.astype('uint32' if volume.max() < 2 ** 32 else 'uint64')
+    return out
+
+
+def load_actions(symbol):
+    # Corporate-action ledger for symbol: one row per ex-date with the as-traded dividend and split ratio
+    return refresh_history(symbol)['actions']
+
+
+def history_version(symbol):
+    # Changes whenever the stored history for symbol is rewritten. Used to key derived caches
+    try:
+        return os.path.getmtime(_history_file(symbol))
+    except OSError:
+        return None
@@ -0,0 +1,135 @@
+import datetime
+import os
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+import data_store
+
+
+###################################################################################################################
+# Financial Statements
+###################################################################################################################
+
+# (statement, frequency) -> yfinance Ticker attribute. All six come back from the same fundamentals request
+STATEMENTS = {
+    ('Income Statement', 'Annual'): 'financials',
+    ('Income Statement', 'Quarterly'): 'quarterly_financials',
+    ('Balance Sheet', 'Annual'): 'balance_sheet',
+    ('Balance Sheet', 'Quarterly'): 'quarterly_balance_sheet',
+    ('Cash Flow', 'Annual'): 'cashflow',
+    ('Cash Flow', 'Quarterly'): 'quarterly_cashflow',
+}
+# A period is final, and never fetched again, once it ended this long ago
+FINAL_AFTER = {'Annual': 365 + 120, 'Quarterly': 180}
+# The next period is expected roughly this long after the last stored period end: the period itself plus the
+# filing deadline. Until then there is nothing new to download
+NEXT_PERIOD_AFTER = {'Annual': 365 + 75, 'Quarterly': 91 + 45}
+RECHECK_AFTER = 7 # days between fetches once a new period is due but has not been published yet
+
+
+def _statements_file(symbol):
+    return data_store.cache_path('statements', '%s.pkl' % symbol.replace('/', '_').replace('^', '_'))
+
+
+def _read_store(symbol):
+    try:
+        return pd.read_pickle(_statements_file(symbol))
+    except (IOError, OSError, EOFError):
+        return {'version': 0, 'checked': None, 'statements': {}}
+
+
+def _write_store(symbol, store):
+    path = _statements_file(symbol)
+    pd.to_pickle(store, path + '.tmp')
+    os.replace(path + '.tmp', path)
+
+
+def _periods(frame):
+    # Provider frames have line items as rows and period ends as columns. Stored frames have one row per period
+    periods = frame.T.apply(pd.to_numeric, errors='coerce')
+    periods.index = pd.DatetimeIndex(periods.index)
+    return periods.sort_index()
+
+
+def _due(store, today):
+    # True when some statement may have a period the store does not have yet
+    if not store['statements']:
+        return True
+    if store['checked'] is not None and (today - store['checked']).days < RECHECK_AFTER:
+        return False
+    for (_, frequency), stored in store['statements'].items():
+        if stored.empty or (today - stored.index[-1].date()).days > NEXT_PERIOD_AFTER[frequency]:
+            return True
+    return False
+
+
+def load_statements(symbol):
+    """All six statements for symbol from the local store, fetching from the provider only when a new period is due.
+
+    Each filing period is stored once. Newly reported periods are appended and recent, not yet final periods
+    are replaced if the provider restated them; final periods are never overwritten. The store's version goes
+    up whenever anything changes.
+    """
+    store = _read_store(symbol)
+    today = datetime.date.today()
+    if not _due(store, today):
+        return store
+
+    ticker = yf.Ticker(symbol)
+    changed = False
+    for key, attribute in STATEMENTS.items():
+        try:
+            fresh = _periods(getattr(ticker, attribute))
+        except Exception:
+            continue
+        if fresh.empty:
+            continue
+        stored = store['statements'].get(key, pd.DataFrame(index=pd.DatetimeIndex([])))
+        final = stored.index[stored.index < pd.Timestamp(today) - pd.Timedelta(days=FINAL_AFTER[key[1]])]
+        fresh = fresh[~fresh.index.isin(final)]
+        merged = pd.concat([stored[~stored.index.isin(fresh.index)], fresh]).sort_index()
+        if not merged.equals(stored):
+            store['statements'][key] = merged
+            changed = True
+
+    store['checked'] = today
+    if changed:
+        store['version'] += 1
+    _write_store(symbol, store)
+    return store
+
+
+def _row(periods, *names):
+    # First line item present under any of the provider's names for it
+    for name in names:
+        if name in periods.columns:
+            return periods[name]
+    return pd.Series(np.nan, index=periods.index)
+
+
+def derived_metrics(store, frequency='Quarterly'):
+    """Growth and margin series computed across all stored periods at once."""
+    income = store['statements'].get(('Income Statement', frequency), pd.DataFrame())
+    cashflow = store['statements'].get(('Cash Flow', frequency), pd.DataFrame())
+    if income.empty:
+        return pd.DataFrame()
+
+    revenue = _row(income, 'Total Revenue')
+    metrics = pd.DataFrame({
+        'Revenue': revenue,
+        'Gross Margin': _row(income, 'Gross Profit') / revenue,
+        'Operating Margin': _row(income, 'Operating Income', 'Ebit') / revenue,
+        'Net Margin': _row(income, 'Net Income', 'Net Income Applicable To Common Shares') / revenue,
+    })
+    # Growth against the previous period and, for quarters, the same quarter a year earlier
+    metrics['Revenue Growth'] = revenue / revenue.shift(1) - 1
+    if frequency == 'Quarterly':
+        metrics['Revenue Growth YoY'] = revenue / revenue.shift(4) - 1
+    if not cashflow.empty:
+        operating = _row(cashflow, 'Total Cash From Operating Activities').reindex(metrics.index)
+        capex = _row(cashflow, 'Capital Expenditures').reindex(metrics.index)
+        metrics['Free Cash Flow'] = operating + capex.fillna(0)
+        metrics['FCF Margin'] = metrics['Free Cash Flow'] / revenue
+    return metrics
@@ -0,0 +1,147 @@
+import argparse
+import datetime
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import data_store
+import memory_cache
+import screener
+
+
+###################################################################################################################
+# Fundamentals History
+###################################################################################################################
+
+HISTORY_DIR = 'fundamentals'
+FIELDS = data_store.SNAPSHOT_FIELDS
+
+
+def _path(*parts):
+    return data_store.cache_path(HISTORY_DIR, *parts)
+
+
+def _load_dictionary():
+    # Symbol dictionary: a symbol's code is its position in this append-only list
+    try:
+        with open(_path('symbols.json')) as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return []
+
+
+def _atomic_save(path, write, mode='wb'):
+    # write(f) fills a temporary file which then replaces path in one step
+    with open(path + '.tmp', mode) as f:
+        write(f)
+    os.replace(path + '.tmp', path)
+
+
+def segments():
+    # Dates with a stored segment, oldest first
+    names = [n for n in os.listdir(os.path.dirname(_path('symbols.json'))) if n.endswith('.npz')]
+    return sorted(datetime.datetime.strptime(n[:-4], '%Y%m%d').date() for n in names)
+
+
+def append_snapshot(table, date=None):
+    """Append one day of fundamentals for every symbol in table to the store.
+
+    Symbols are dictionary encoded as int32 codes. For each field only the symbols whose value changed since
+    the previous snapshot are written (change-only delta encoding), so slow moving fields such as shares
+    outstanding cost almost nothing per day. The latest value of every field is kept in a small state matrix
+    to detect changes. Existing segments are never rewritten.
+    """
+    date = date or datetime.date.today()
+    segment = _path(date.strftime('%Y%m%d') + '.npz')
+    if os.path.exists(segment):
+        return 0
+
+    symbols = _load_dictionary()
+    codes = {symbol: i for i, symbol in enumerate(symbols)}
+    for symbol in table['Symbol']:
+        if symbol not in codes:
+            codes[symbol] = len(symbols)
+            symbols.append(symbol)
+
+    try:
+        latest = np.load(_path('latest.npy'))
+    except (IOError, OSError):
+        latest = np.empty((0, len(FIELDS)), dtype='float32')
+    if len(latest) < len(symbols):
+        latest = np.vstack([latest, np.full((len(symbols) - len(latest), len(FIELDS)), np.nan, dtype='float32')])
+
+    rows = np.array([codes[s] for s in table['Symbol']], dtype='int32')
+    order = np.argsort(rows)
+    rows = rows[order]
+    values = table[FIELDS].to_numpy(dtype='float32')[order]
+
+    # A value counts as changed unless it equals the stored one, with NaN equal to NaN
+    previous = latest[rows]
+    changed = ~((values == previous) | (np.isnan(values) & np.isnan(previous)))
+    arrays = {}
+    for j, field in enumerate(FIELDS):
+        arrays[field + '.codes'] = rows[changed[:, j]]
+        arrays[field + '.values'] = values[changed[:, j], j]
+    latest[rows] = values
+
+    # Dictionary, then segment, then state: after a crash the next run at worst records a few redundant changes
+    _atomic_save(_path('symbols.json'), lambda f: json.dump(symbols, f), mode='w')
+    _atomic_save(segment, lambda f: np.savez_compressed(f, **arrays))
+    _atomic_save(_path('latest.npy'), lambda f: np.save(f, latest))
+    return int(changed.sum())
+
+
+_histories = memory_cache.LRUCache('fundamentals_history')
+
+
+def metric_history(symbol, field):
+    """Daily series of one fundamental for symbol, rebuilt by replaying the change records.
+
+    Each change record holds from its date until the next one, so a value that went missing stays NaN rather
+    than repeating the last known one. Memoised until a new segment is appended.
+    """
+    dates = segments()
+    version = dates[-1] if dates else None
+    return _histories.cached((symbol, field), lambda: _replay(symbol, field, dates), version)
+
+
+def _replay(symbol, field, dates):
+    symbols = _load_dictionary()
+    if symbol not in symbols:
+        return pd.Series(dtype='float64', name=field)
+    code = symbols.index(symbol)
+
+    changes = {}
+    for date in dates:
+        with np.load(_path(date.strftime('%Y%m%d') + '.npz')) as segment:
+            codes = segment[field + '.codes']
+            i = np.searchsorted(codes, code)
+            if i < len(codes) and codes[i] == code:
+                changes[date] = float(segment[field + '.values'][i])
+
+    # Reindexing with method='ffill' carries the latest record by date, NaN records included, where .ffill()
+    # would skip over them
+    series = pd.Series(list(changes.values()), index=pd.DatetimeIndex(list(changes)), dtype='float64', name=field)
+    return series.reindex(pd.DatetimeIndex(dates), method='ffill')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Append today's fundamentals snapshot for the universe.")
+    parser.add_argument('--workers', type=int, default=8, help='number of concurrent info requests')
+    args = parser.parse_args()
+
+    start_exec = time.time()
+    # Reuse the screener's table when it was already collected today rather than fetching everything twice
+    table = screener.load_snapshots()
+    try:
+        collected = datetime.date.fromtimestamp(os.path.getmtime(data_store.cache_path(screener.SNAPSHOT_FILE)))
+    except OSError:
+        collected = None
+    fresh = collected == datetime.date.today()
+    if table is None or not fresh:
+        table = screener.build_snapshots(data_store.load_universe(), workers=args.workers)
+    changed = append_snapshot(table)
+    print("Stored {} changed values for {} symbols in {} seconds".format(changed, len(table), round(time.time() - start_exec, 2)))
@@ -0,0 +1,124 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+import memory_cache
+
+
+###################################################################################################################
+# Intraday Bars
+###################################################################################################################
+
+# Interval -> how far back the first fetch reaches. The provider keeps 1m bars for 7 days only
+INTERVALS = {
+    '1m': '1d',
+    '5m': '5d',
+    '15m': '5d',
+}
+INTERVAL_SECONDS = {'1m': 60, '5m': 300, '15m': 900}
+CAPACITY = 2000 # bars kept per (symbol, interval); older bars fall off the front of the ring
+COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+class BarRingBuffer:
+    """Fixed size store of the most recent intraday bars for one symbol.
+
+    Timestamps are int64 nanoseconds and OHLCV values sit in a single float64 block, so memory is
+    CAPACITY * 48 bytes no matter how long the session runs. The last bar may still be forming and is
+    overwritten in place when the provider sends it again.
+    """
+
+    def __init__(self, capacity=CAPACITY):
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype='int64')
+        self.values = np.zeros((capacity, len(COLUMNS)), dtype='float64')
+        self.start = 0
+        self.size = 0
+        self.lock = threading.Lock()
+        self.last_poll = 0.0
+
+    def __len__(self):
+        return self.size
+
+    def _slot(self, i):
+        return (self.start + i) % self.capacity
+
+    def last_time(self):
+        return self.times[self._slot(self.size - 1)] if self.size else None
+
+    def append(self, bars):
+        # Ingest provider bars, ignoring anything older than what is stored. Returns the number of new bars
+        if bars.empty:
+            return 0
+        times = pd.DatetimeIndex(bars.index).tz_localize(None).values.astype('datetime64[ns]').view('int64')
+        values = bars[COLUMNS].to_numpy(dtype='float64')
+        added = 0
+        with self.lock:
+            last = self.last_time()
+            for t, row in zip(times, values):
+                if last is not None and t < last:
+                    continue
+                if last is not None and t == last:
+                    self.values[self._slot(self.size - 1)] = row
+                    continue
+                if self.size < self.capacity:
+                    slot = self._slot(self.size)
+                    self.size += 1
+                else:
+                    slot = self.start
+                    self.start = (self.start + 1) % self.capacity
+                self.times[slot] = t
+                self.values[slot] = row
+                last = t
+                added += 1
+        return added
+
+    def since(self, after=None, completed_only=False):
+        # Bars with a timestamp after `after` (ns), oldest first, as a DataFrame with a Date column
+        with self.lock:
+            order = (self.start + np.arange(self.size)) % self.capacity
+            times = self.times[order]
+            values = self.values[order]
+        keep = np.ones(len(times), dtype=bool)
+        if after is not None:
+            keep &= times > after
+        if completed_only and len(times):
+            keep[-1] = False
+        frame = pd.DataFrame(values[keep], columns=COLUMNS)
+        frame.insert(0, 'Date', pd.to_datetime(times[keep]))
+        return frame
+
+
+_buffers = memory_cache.LRUCache('intraday')
+_buffers_lock = threading.Lock()
+
+
+def get_buffer(symbol, interval):
+    # An evicted buffer is simply started again, the next poll downloads its look-back period
+    with _buffers_lock:
+        return _buffers.cached((symbol, interval), BarRingBuffer)
+
+
+def poll(symbol, interval):
+    """Bring the ring buffer for (symbol, interval) up to date and return it.
+
+    The first call downloads the look-back period for the interval. Later calls ask only for bars from the
+    last stored timestamp onwards, and are skipped entirely if another session polled within the interval.
+    """
+    buffer = get_buffer(symbol, interval)
+    now = time.time()
+    if now - buffer.last_poll < INTERVAL_SECONDS[interval] / 2:
+        return buffer
+    buffer.last_poll = now
+
+    ticker = yf.Ticker(symbol)
+    last = buffer.last_time()
+    if last is None:
+        bars = ticker.history(period=INTERVALS[interval], interval=interval)
+    else:
+        bars = ticker.history(start=pd.Timestamp(last).date(), interval=interval)
+    buffer.append(bars)
+    return buffer
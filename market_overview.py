@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+import memory_cache
+import returns_matrix
+
+
+###################################################################################################################
+# Market Overview
+###################################################################################################################
+
+PERIODS = ['Daily', 'Weekly', 'YTD']
+WEEK = 5 # trading days
+
+_cache = memory_cache.LRUCache('sector_performance')
+
+
+def symbol_performance(matrix):
+    # Daily, weekly and YTD return for every column of the returns matrix, compounded in log space
+    last_date = matrix.dates[-1]
+    year_start = np.datetime64(str(last_date.astype('datetime64[Y]')), 'D')
+    log_returns = {
+        'Daily': matrix.values[-1:],
+        'Weekly': matrix.values[-WEEK:],
+        'YTD': matrix.values[matrix.rows(year_start)],
+    }
+    performance = pd.DataFrame({'Symbol': matrix.symbols})
+    for period, block in log_returns.items():
+        traded = (~np.isnan(block)).any(axis=0)
+        compounded = np.expm1(np.nansum(np.log1p(block.astype('float64')), axis=0))
+        performance[period] = np.where(traded, compounded, np.nan)
+    return performance
+
+
+def sector_performance(universe, matrix=None):
+    """Market cap weighted Daily/Weekly/YTD return per (Sector, Industry), plus the symbol count and total cap.
+
+    Computed with one grouped aggregation over the latest returns matrix and cached until the next build.
+    """
+    matrix = matrix or returns_matrix.ReturnsMatrix()
+    cached = _cache.get(matrix.build_id)
+    if cached is not memory_cache.MISSING:
+        return cached
+
+    frame = universe[['Symbol', 'Sector', 'Industry', 'Market Cap']].drop_duplicates('Symbol').merge(
+        symbol_performance(matrix), on='Symbol', how='inner')
+    frame['Market Cap'] = pd.to_numeric(frame['Market Cap'], errors='coerce')
+    frame = frame[frame['Market Cap'] > 0]
+    frame[['Sector', 'Industry']] = frame[['Sector', 'Industry']].fillna('N/A')
+
+    # Weighted sums and the weights that go with them, so the weighted mean survives missing returns
+    for period in PERIODS:
+        has_return = frame[period].notna()
+        frame[period + ' Weight'] = frame['Market Cap'].where(has_return, 0)
+        frame[period] = frame[period].fillna(0) * frame[period + ' Weight']
+
+    sums = frame.groupby(['Sector', 'Industry']).agg(
+        **{period: (period, 'sum') for period in PERIODS},
+        **{period + ' Weight': (period + ' Weight', 'sum') for period in PERIODS},
+        **{'Market Cap': ('Market Cap', 'sum'), 'Symbols': ('Symbol', 'size')}
+    ).reset_index()
+
+    result = (_weighted(sums, ['Sector', 'Industry']),
+              _weighted(sums.groupby('Sector', as_index=False).sum(numeric_only=True), ['Sector']))
+    return _cache.put(matrix.build_id, result)
+
+
+def _weighted(sums, keys):
+    out = sums[keys + ['Market Cap', 'Symbols']].copy()
+    for period in PERIODS:
+        weight = sums[period + ' Weight']
+        out[period] = (sums[period] / weight.where(weight > 0)).to_numpy()
+    return out
@@ -0,0 +1,138 @@
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+###################################################################################################################
+# In-Process Caches
+###################################################################################################################
+
+# Total bytes all caches in this process may hold. The instance has 0.5 GB and Streamlit, pandas and the
+# imported libraries take roughly half of that before anything is cached
+BUDGET = int(float(os.environ.get('STOCK_APP_MEMORY_BUDGET_MB', 160)) * 1024 * 1024)
+
+MISSING = object()
+
+_lock = threading.RLock()
+_caches = []
+_clock = itertools.count() # global recency order, so eviction picks the least recently used entry of any cache
+
+
+def sizeof(value):
+    """Approximate bytes held by value, counting DataFrame and Series contents with deep memory usage."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.memmap):
+        return sys.getsizeof(value) # file backed, the pages belong to the OS page cache
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes) + 112
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeof(k) + sizeof(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(sizeof(v) for v in value)
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if hasattr(value, '__dict__') and not isinstance(value, type):
+        return sys.getsizeof(value) + sizeof(vars(value))
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """Named in-process cache whose entries count against the shared BUDGET.
+
+    Entries can carry a version and are a miss once the caller's version differs, and a ttl can be given on
+    read. When the budget is exceeded the least recently used entries are evicted, across all caches, until
+    the total fits again. Hits, misses and evictions are counted per cache.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.entries = OrderedDict() # key -> [tick, version, stored, size, value]
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        with _lock:
+            _caches.append(self)
+
+    def get(self, key, version=None, ttl=None):
+        with _lock:
+            entry = self.entries.get(key)
+            if not _fresh(entry, version, ttl):
+                self.misses += 1
+                return MISSING
+            entry[0] = next(_clock)
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[4]
+
+    def contains(self, key, version=None, ttl=None):
+        # Whether get would hit, without counting a hit or miss or refreshing the entry's recency
+        with _lock:
+            return _fresh(self.entries.get(key), version, ttl)
+
+    def put(self, key, value, version=None, size=None):
+        size = sizeof(value) if size is None else size
+        with _lock:
+            self._remove(key)
+            if size > BUDGET:
+                return value # would evict everything else and still not fit
+            self.entries[key] = [next(_clock), version, time.time(), size, value]
+            self.bytes += size
+            _evict()
+        return value
+
+    def pop(self, key):
+        with _lock:
+            self._remove(key)
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[3]
+
+    def cached(self, key, compute, version=None, ttl=None):
+        # Value for key, computing and storing it on a miss. compute runs outside the lock
+        value = self.get(key, version, ttl)
+        if value is MISSING:
+            value = self.put(key, compute(), version)
+        return value
+
+    def stats(self):
+        return {'Cache': self.name, 'Entries': len(self.entries), 'Bytes': self.bytes,
+                'Hits': self.hits, 'Misses': self.misses, 'Evictions': self.evictions}
+
+
+def _fresh(entry, version, ttl):
+    return entry is not None and entry[1] == version and (ttl is None or time.time() - entry[2] <= ttl)
+
+
+def total_bytes():
+    with _lock:
+        return sum(cache.bytes for cache in _caches)
+
+
+def _evict():
+    # Called with _lock held. Each cache's oldest entry is at the front, the globally oldest is the minimum tick
+    total = sum(cache.bytes for cache in _caches)
+    while total > BUDGET:
+        oldest = min((c for c in _caches if c.entries), key=lambda c: next(iter(c.entries.values()))[0])
+        _, entry = oldest.entries.popitem(last=False)
+        oldest.bytes -= entry[3]
+        oldest.evictions += 1
+        total -= entry[3]
+
+
+def stats():
+    # One row per cache with its size and counters
+    with _lock:
+        return pd.DataFrame([cache.stats() for cache in _caches],
+                            columns=['Cache', 'Entries', 'Bytes', 'Hits', 'Misses', 'Evictions'])
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+import memory_cache
+import shared_cache
+
+
+###################################################################################################################
+# Options Chains
+###################################################################################################################
+
+EXPIRATIONS_TTL = 60 * 60 # expiries change at most daily
+CHAIN_TTL = 5 * 60
+CHAIN_COLUMNS = ['strike', 'lastPrice', 'bid', 'ask', 'volume', 'openInterest', 'impliedVolatility']
+
+
+_cache = memory_cache.LRUCache('options_chain')
+
+
+def _cached(key, ttl, fetch):
+    # In-process copy in front of the TTL cache shared by every app process on the host
+    return _cache.cached(key, lambda: shared_cache.cached(key, fetch, ttl=ttl), ttl=ttl)
+
+
+def get_expirations(symbol):
+    # Expiry dates only, a single light request. No chain is downloaded here
+    return _cached(('expirations', symbol), EXPIRATIONS_TTL, lambda: list(yf.Ticker(symbol).options))
+
+
+def _compact(frame, option_type):
+    chain = pd.DataFrame({column: pd.to_numeric(frame[column], errors='coerce').astype('float32')
+                          for column in CHAIN_COLUMNS})
+    chain['inTheMoney'] = frame['inTheMoney'].astype(bool).to_numpy()
+    chain['type'] = option_type
+    return chain
+
+
+def get_chain(symbol, expiry):
+    """Calls and puts for one expiry in a single frame, fetched on first use and cached for CHAIN_TTL.
+
+    Numeric columns are float32 and the option type is categorical, which keeps a cached chain to a few
+    tens of kilobytes.
+    """
+    def fetch():
+        chain = yf.Ticker(symbol).option_chain(expiry)
+        frame = pd.concat([_compact(chain.calls, 'call'), _compact(chain.puts, 'put')], ignore_index=True)
+        frame['type'] = frame['type'].astype('category')
+        return frame
+    return _cached(('chain', symbol, expiry), CHAIN_TTL, fetch)
+
+
+def iv_smile(chain, spot=None):
+    # Implied volatility by strike for calls and puts, with moneyness when the spot price is known
+    smile = chain.loc[chain['impliedVolatility'] > 0, ['type', 'strike', 'impliedVolatility', 'openInterest']].copy()
+    if spot:
+        smile['moneyness'] = smile['strike'] / np.float32(spot)
+    return smile
+
+
+def open_interest_summary(chain):
+    """Open interest per type, put/call ratio and max pain for one expiry.
+
+    Max pain is the strike where the total intrinsic value paid to holders is lowest. Payouts for every
+    candidate strike are computed at once with a strikes x contracts broadcast.
+    """
+    oi = chain['openInterest'].fillna(0).to_numpy(dtype='float64')
+    strikes = chain['strike'].to_numpy(dtype='float64')
+    is_call = (chain['type'] == 'call').to_numpy()
+
+    call_oi = oi[is_call].sum()
+    put_oi = oi[~is_call].sum()
+    candidates = np.unique(strikes)
+    intrinsic = np.where(is_call, candidates[:, None] - strikes, strikes - candidates[:, None])
+    payout = (np.maximum(intrinsic, 0) * oi).sum(axis=1)
+    return {
+        'Call OI': int(call_oi),
+        'Put OI': int(put_oi),
+        'Put/Call OI': round(put_oi / call_oi, 2) if call_oi else np.nan,
+        'Max Pain': float(candidates[np.argmin(payout)]) if len(candidates) else np.nan,
+    }
@@ -0,0 +1,16 @@
+import os
+
+
+###################################################################################################################
+# Cache Directory
+###################################################################################################################
+
+# Everything the app downloads is kept under this directory so batch jobs and the web app share the same files
+CACHE_DIR = os.environ.get('STOCK_APP_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+
+
+def cache_path(*parts):
+    # Build a path inside the cache directory, creating parent folders on the way
+    path = os.path.join(CACHE_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
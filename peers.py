@@ -0,0 +1,122 @@
+import os
+import threading
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import data_store
+import returns_matrix
+import screener
+
+
+###################################################################################################################
+# Similar Stocks
+###################################################################################################################
+
+RETURN_DAYS = 252 # trailing trading days in each return vector
+RETURN_WEIGHT = 0.7 # share of the similarity that comes from co-movement, the rest from fundamentals
+FUNDAMENTAL_FIELDS = [
+    'marketCap', 'beta', 'trailingPE', 'forwardPE', 'priceToSalesTrailing12Months', 'priceToBook',
+    'profitMargins', 'dividendYield', 'earningsQuarterlyGrowth', 'shortPercentOfFloat',
+]
+
+
+def _unit_rows(block):
+    norms = np.linalg.norm(block, axis=1, keepdims=True)
+    return block / np.where(norms > 0, norms, 1)
+
+
+def return_vectors(matrix, days=RETURN_DAYS):
+    # One z-scored, unit length row per symbol over the trailing window. Days without a trade count as average
+    block = np.asarray(matrix.values[-days:], dtype='float32').T
+    with warnings.catch_warnings():
+        # Symbols that never traded in the window end up as all zero rows
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        mean = np.nanmean(block, axis=1, keepdims=True)
+        std = np.nanstd(block, axis=1, keepdims=True)
+    block = np.nan_to_num((block - mean) / np.where(std > 0, std, 1))
+    return _unit_rows(block).astype('float32')
+
+
+def fundamental_vectors(table, symbols):
+    # Percentile ranks of each fundamental, centred on zero, aligned to symbols. Missing values sit in the middle
+    ranked = table.set_index('Symbol')[FUNDAMENTAL_FIELDS].rank(pct=True) - 0.5
+    ranked = ranked[~ranked.index.duplicated()].reindex(symbols)
+    return _unit_rows(ranked.fillna(0).to_numpy(dtype='float32'))
+
+
+NOT_BUILT = object() # fundamentals version before a build. Distinct from None, the version when there are no snapshots
+
+
+class PeerIndex:
+    """Exact nearest-neighbour index over returns and fundamentals for the whole universe.
+
+    Every row is unit length, so similarity is a single matrix-vector product followed by argpartition. The
+    return and fundamental blocks are kept separately and rebuilt only when their source changes: a new
+    returns matrix build or a new snapshot table.
+    """
+
+    def __init__(self):
+        self.symbols = []
+        self.position = {}
+        self.returns_version = None
+        self.fundamentals_version = NOT_BUILT
+        self.return_block = None
+        self.fundamental_block = None
+        self.vectors = None
+
+    def update(self):
+        changed = False
+        build_id = returns_matrix.current_build()
+        if build_id != self.returns_version:
+            matrix = returns_matrix.ReturnsMatrix(build_id)
+            self.symbols = list(matrix.symbols)
+            self.position = {symbol: i for i, symbol in enumerate(self.symbols)}
+            self.return_block = return_vectors(matrix)
+            self.returns_version = matrix.build_id
+            self.fundamentals_version = NOT_BUILT # realign fundamentals to the new symbol list
+            changed = True
+
+        try:
+            version = os.path.getmtime(data_store.cache_path(screener.SNAPSHOT_FILE))
+        except OSError:
+            version = None
+        if version != self.fundamentals_version:
+            table = screener.load_snapshots()
+            if table is None:
+                self.fundamental_block = np.zeros((len(self.symbols), len(FUNDAMENTAL_FIELDS)), dtype='float32')
+            else:
+                self.fundamental_block = fundamental_vectors(table, self.symbols)
+            self.fundamentals_version = version
+            changed = True
+
+        if changed:
+            self.vectors = _unit_rows(np.hstack([
+                self.return_block * np.sqrt(RETURN_WEIGHT),
+                self.fundamental_block * np.sqrt(1 - RETURN_WEIGHT),
+            ])).astype('float32')
+        return self
+
+    def query(self, symbol, k=10):
+        # Top k most similar symbols with their cosine similarity, best first
+        if symbol not in self.position:
+            return pd.DataFrame(columns=['Symbol', 'Similarity'])
+        scores = self.vectors @ self.vectors[self.position[symbol]]
+        scores[self.position[symbol]] = -np.inf
+        k = min(k, len(scores) - 1)
+        if k <= 0:
+            return pd.DataFrame(columns=['Symbol', 'Similarity'])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return pd.DataFrame({'Symbol': [self.symbols[i] for i in top], 'Similarity': scores[top]})
+
+
+_index = PeerIndex()
+_index_lock = threading.Lock()
+
+
+def similar_stocks(symbol, k=10):
+    # Query the process wide index, refreshing it first if new data has landed
+    with _index_lock:
+        return _index.update().query(symbol, k)
@@ -0,0 +1,148 @@
+import threading
+import time
+
+import requests
+
+
+###################################################################################################################
+# Live Quotes
+###################################################################################################################
+
+QUOTE_URL = 'https://query1.finance.yahoo.com/v7/finance/quote'
+QUOTE_INTERVAL = 15 # seconds between upstream calls
+QUOTE_FIELDS = [
+    'regularMarketPrice', 'regularMarketChange', 'regularMarketChangePercent', 'regularMarketDayHigh',
+    'regularMarketDayLow', 'regularMarketVolume', 'regularMarketPreviousClose', 'regularMarketTime',
+]
+STALE_AFTER = QUOTE_INTERVAL * 4 # drop subscriptions that have not been renewed for this long
+BATCH_SIZE = 200 # symbols per upstream request, well inside the endpoint's URL limit
+
+
+def fetch_quotes(symbols):
+    # One request per BATCH_SIZE symbols returning the regular market fields for each of them
+    quotes = {}
+    symbols = sorted(symbols)
+    for i in range(0, len(symbols), BATCH_SIZE):
+        response = requests.get(QUOTE_URL, params={'symbols': ','.join(symbols[i:i + BATCH_SIZE])},
+                                headers={'User-Agent': 'Mozilla/5.0'}, timeout=10)
+        response.raise_for_status()
+        for result in response.json().get('quoteResponse', {}).get('result', []):
+            quotes[result['symbol']] = {field: result.get(field) for field in QUOTE_FIELDS}
+    return quotes
+
+
+class QuotePoller(threading.Thread):
+    """Background thread polling quotes for every symbol any session is currently viewing.
+
+    Sessions subscribe to a symbol and renew the subscription on every tick. A session holds one subscription:
+    subscribing again, on a rerun or after switching symbols, reuses or replaces it. Each interval the poller makes a
+    single batched upstream call for the distinct subscribed symbols, stores the results and wakes every
+    session waiting in `wait`. Upstream load therefore grows with distinct symbols, not with sessions.
+    """
+
+    def __init__(self, interval=QUOTE_INTERVAL):
+        super(QuotePoller, self).__init__(name='quote-poller', daemon=True)
+        self.interval = interval
+        self.quotes = {}
+        self.version = 0
+        self._subscribers = {} # token -> (symbol, last renewed)
+        self._sessions = {} # session id -> its token
+        self._watched = {} # name -> symbols polled without a session, e.g. for alert rules
+        self._listeners = []
+        self._next_token = 0
+        self._lock = threading.Lock()
+        self._updated = threading.Condition(self._lock)
+
+    def subscribe(self, symbol, session=None):
+        with self._lock:
+            token = self._sessions.get(session)
+            if token in self._subscribers:
+                if self._subscribers[token][0] == symbol:
+                    self._subscribers[token] = (symbol, time.time())
+                    return token
+                del self._subscribers[token] # the session moved on to another symbol
+            self._next_token += 1
+            self._subscribers[self._next_token] = (symbol, time.time())
+            if session is not None:
+                self._sessions[session] = self._next_token
+            return self._next_token
+
+    def renew(self, token):
+        with self._lock:
+            if token in self._subscribers:
+                self._subscribers[token] = (self._subscribers[token][0], time.time())
+
+    def unsubscribe(self, token):
+        with self._lock:
+            self._subscribers.pop(token, None)
+            self._sessions = {session: t for session, t in self._sessions.items() if t != token}
+
+    def watch(self, name, symbols):
+        # Replace the standing set of symbols registered under name
+        with self._lock:
+            self._watched[name] = set(symbols)
+
+    def add_listener(self, callback):
+        # callback(quotes) is called from the poller thread after every poll
+        with self._lock:
+            if callback not in self._listeners:
+                self._listeners.append(callback)
+
+    def symbols(self):
+        with self._lock:
+            cutoff = time.time() - STALE_AFTER
+            for token, (_, renewed) in list(self._subscribers.items()):
+                if renewed < cutoff:
+                    del self._subscribers[token]
+            self._sessions = {session: t for session, t in self._sessions.items() if t in self._subscribers}
+            symbols = set(symbol for symbol, _ in self._subscribers.values())
+            for watched in self._watched.values():
+                symbols |= watched
+            return symbols
+
+    def latest(self, symbol):
+        with self._lock:
+            return self.quotes.get(symbol), self.version
+
+    def wait(self, version, timeout=None):
+        # Block until a poll newer than version is published. Returns the current version
+        with self._lock:
+            self._updated.wait_for(lambda: self.version != version, timeout=timeout or self.interval)
+            return self.version
+
+    def run(self):
+        while True:
+            started = time.time()
+            symbols = self.symbols()
+            if symbols:
+                try:
+                    quotes = fetch_quotes(symbols)
+                except Exception:
+                    quotes = {}
+                with self._lock:
+                    self.quotes.update(quotes)
+                    for symbol in set(self.quotes) - symbols:
+                        del self.quotes[symbol]
+                    self.version += 1
+                    self._updated.notify_all()
+                    listeners = list(self._listeners)
+                for listener in listeners:
+                    try:
+                        listener(quotes)
+                    except Exception:
+                        pass
+            time.sleep(max(0, self.interval - (time.time() - started)))
+
+
+_poller = None
+_poller_lock = threading.Lock()
+
+
+def get_poller():
+    # The process wide poller, started on first use
+    global _poller
+    with _poller_lock:
+        if _poller is None:
+            _poller = QuotePoller()
+            _poller.start()
+        return _poller
@@ -0,0 +1,165 @@
+import argparse
+import json
+import os
+import shutil
+import time
+import warnings
+
+import numpy as np
+
+import data_store
+
+
+###################################################################################################################
+# Universe Returns Matrix
+###################################################################################################################
+
+RETURNS_DIR = 'returns'
+CURRENT_FILE = 'CURRENT' # names the build directory readers should open, swapped atomically after each build
+KEEP_BUILDS = 2
+# dates x symbols float32 matrices written by each build: close-to-close returns, overnight gaps
+# (open over previous close), raw daily volume and the adjusted close itself
+MATRICES = ['returns', 'gaps', 'volume', 'close']
+
+
+def _history(symbol):
+    # Open, Close and Volume for symbol, or None when it has no usable history
+    try:
+        history = data_store.load_history(symbol)[['Open', 'Close', 'Volume']]
+    except Exception:
+        return None
+    return history if len(history) > 1 else None
+
+
+def build_returns_matrix(symbols):
+    """Nightly job: write dates x symbols float32 matrices of returns, gaps, volume and close for the universe.
+
+    Each matrix is stored in Fortran order so each symbol's column is contiguous on disk, with the symbol list
+    and the trading dates in sidecar files. Each build goes to a fresh directory and CURRENT is replaced last,
+    so readers never see a half written matrix. When no symbol has usable history the matrices are empty.
+    """
+    # First pass: the trading dates of every usable symbol. Histories are dropped as soon as their dates are read
+    dates = np.array([], dtype='datetime64[D]')
+    names = []
+    for symbol in sorted(set(symbols)):
+        history = _history(symbol)
+        if history is not None:
+            dates = np.union1d(dates, history.index.values.astype('datetime64[D]'))
+            names.append(symbol)
+
+    build_id = time.strftime('%Y%m%d-%H%M%S')
+    build_dir = os.path.dirname(data_store.cache_path(RETURNS_DIR, build_id, 'returns.npy'))
+    matrices = {
+        name: np.lib.format.open_memmap(os.path.join(build_dir, name + '.npy'), mode='w+', dtype='float32',
+                                        shape=(len(dates), len(names)), fortran_order=True)
+        for name in MATRICES
+    }
+    # Second pass: load each symbol again and write it straight into its columns, so only a single symbol's
+    # series is ever held in memory
+    for i, symbol in enumerate(names):
+        for values in matrices.values():
+            values[:, i] = np.nan
+        history = _history(symbol)
+        if history is None:
+            continue # went away between the passes, left as NaN
+        rows = np.searchsorted(dates, history.index.values.astype('datetime64[D]'))
+        close = history['Close'].to_numpy(dtype='float64')
+        matrices['returns'][rows[1:], i] = close[1:] / close[:-1] - 1
+        matrices['gaps'][rows[1:], i] = history['Open'].to_numpy(dtype='float64')[1:] / close[:-1] - 1
+        matrices['volume'][rows, i] = history['Volume'].to_numpy(dtype='float64')
+        matrices['close'][rows, i] = close
+    for values in matrices.values():
+        values.flush()
+    del matrices
+
+    np.save(os.path.join(build_dir, 'dates.npy'), dates)
+    with open(os.path.join(build_dir, 'symbols.json'), 'w') as f:
+        json.dump(names, f)
+
+    current = data_store.cache_path(RETURNS_DIR, CURRENT_FILE)
+    with open(current + '.tmp', 'w') as f:
+        f.write(build_id)
+    os.replace(current + '.tmp', current)
+
+    # Keep the previous build for readers that still have it open and drop anything older
+    returns_dir = os.path.dirname(current)
+    builds = sorted(d for d in os.listdir(returns_dir) if os.path.isdir(os.path.join(returns_dir, d)))
+    for old in builds[:-KEEP_BUILDS]:
+        shutil.rmtree(os.path.join(returns_dir, old), ignore_errors=True)
+    return build_id
+
+
+def current_build():
+    # Build id readers should open. One small file read, cheap enough to check on every page load
+    with open(data_store.cache_path(RETURNS_DIR, CURRENT_FILE)) as f:
+        return f.read().strip()
+
+
+class ReturnsMatrix:
+    """Read-only, memory-mapped view of the latest returns matrix.
+
+    Only the pages that are actually read get loaded, so opening the matrix is cheap even on the 0.5 GB
+    instance. Column and date-range slices are numpy views over the mapped file. An empty build raises IOError
+    like a missing one, so callers show the same "run returns_matrix.py" message.
+    """
+
+    def __init__(self, build_id=None):
+        build_id = build_id or current_build()
+        build_dir = os.path.dirname(data_store.cache_path(RETURNS_DIR, build_id, 'returns.npy'))
+        self.build_id = build_id
+        self.dates = np.load(os.path.join(build_dir, 'dates.npy'))
+        if not len(self.dates):
+            raise IOError('returns matrix {} is empty, no symbol had stored history when it was built'.format(build_id))
+        self.values = np.load(os.path.join(build_dir, 'returns.npy'), mmap_mode='r')
+        self.gaps = np.load(os.path.join(build_dir, 'gaps.npy'), mmap_mode='r')
+        self.volume = np.load(os.path.join(build_dir, 'volume.npy'), mmap_mode='r')
+        self.close = np.load(os.path.join(build_dir, 'close.npy'), mmap_mode='r')
+        with open(os.path.join(build_dir, 'symbols.json')) as f:
+            self.symbols = json.load(f)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+
+    def rows(self, start=None, end=None):
+        # Row slice covering start <= date < end
+        lo = 0 if start is None else np.searchsorted(self.dates, np.datetime64(start, 'D'))
+        hi = len(self.dates) if end is None else np.searchsorted(self.dates, np.datetime64(end, 'D'))
+        return slice(lo, hi)
+
+    def column(self, symbol, start=None, end=None):
+        # Zero-copy view of one symbol's returns
+        return self.values[self.rows(start, end), self.index[symbol]]
+
+    def columns(self, symbols):
+        # Column positions of the symbols present in the matrix
+        return np.array([self.index[s] for s in symbols if s in self.index], dtype='int64')
+
+    def group_mean(self, symbols, start=None, end=None):
+        # Equal weighted average return per date across symbols, e.g. a sector
+        block = self.values[self.rows(start, end)][:, self.columns(symbols)]
+        with warnings.catch_warnings():
+            # Dates where none of the symbols traded are expected and come back as NaN
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            return np.nanmean(block, axis=1) if block.shape[1] else np.full(block.shape[0], np.nan)
+
+    def breadth(self, symbols=None, start=None, end=None):
+        # Share of symbols with a positive return per date
+        block = self.values[self.rows(start, end)]
+        if symbols is not None:
+            block = block[:, self.columns(symbols)]
+        traded = (~np.isnan(block)).sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (block > 0).sum(axis=1) / traded
+
+    def correlation(self, symbols, start=None, end=None):
+        # Pairwise correlation over the dates where every symbol traded
+        block = np.asarray(self.values[self.rows(start, end)][:, self.columns(symbols)], dtype='float64')
+        block = block[~np.isnan(block).any(axis=1)]
+        return np.corrcoef(block, rowvar=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build the memory-mapped daily returns matrix for the universe.')
+    parser.parse_args()
+
+    start_exec = time.time()
+    build_id = build_returns_matrix(data_store.load_universe()['Symbol'].dropna().astype(str).tolist())
+    print("Built returns matrix {} in {} seconds".format(build_id, round(time.time() - start_exec, 2)))
@@ -0,0 +1,218 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import as_strided
+
+import data_store
+import memory_cache
+import telemetry
+
+
+###################################################################################################################
+# Risk Metrics
+###################################################################################################################
+
+BENCHMARK = '^GSPC' # S&P 500, the same benchmark the provider's SandP52WeekChange refers to
+TRADING_DAYS = 252
+WINDOWS = [21, 63, 126, 252]
+
+_cache = memory_cache.LRUCache('risk_metrics')
+
+
+def rolling_windows(values, window):
+    # Read-only (n - window + 1, window) view over values. No data is copied
+    values = np.ascontiguousarray(values, dtype='float64')
+    n = len(values) - window + 1
+    if n <= 0:
+        return np.empty((0, window))
+    stride = values.strides[0]
+    return as_strided(values, shape=(n, window), strides=(stride, stride), writeable=False)
+
+
+def daily_returns(close):
+    close = np.asarray(close, dtype='float64')
+    return close[1:] / close[:-1] - 1
+
+
+def rolling_beta(returns, benchmark_returns, window):
+    x = rolling_windows(benchmark_returns, window)
+    y = rolling_windows(returns, window)
+    x_mean = x.mean(axis=1)
+    covariance = (x * y).mean(axis=1) - x_mean * y.mean(axis=1)
+    variance = (x * x).mean(axis=1) - x_mean ** 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return covariance / variance
+
+
+def rolling_volatility(returns, window):
+    return rolling_windows(returns, window).std(axis=1, ddof=1) * np.sqrt(TRADING_DAYS)
+
+
+def max_drawdown(close):
+    close = np.asarray(close, dtype='float64')
+    if len(close) == 0:
+        return np.nan
+    return (close / np.maximum.accumulate(close) - 1).min()
+
+
+def sharpe_ratio(returns, risk_free=0.0):
+    excess = returns - risk_free / TRADING_DAYS
+    std = excess.std(ddof=1)
+    return excess.mean() / std * np.sqrt(TRADING_DAYS) if std > 0 else np.nan
+
+
+def sortino_ratio(returns, risk_free=0.0):
+    excess = returns - risk_free / TRADING_DAYS
+    downside = np.sqrt(np.mean(np.minimum(excess, 0) ** 2))
+    return excess.mean() / downside * np.sqrt(TRADING_DAYS) if downside > 0 else np.nan
+
+
+def value_at_risk(returns, confidence=0.95):
+    # Historical one-day VaR, reported as a positive loss fraction
+    if len(returns) == 0:
+        return np.nan
+    return -np.percentile(returns, (1 - confidence) * 100)
+
+
+def aligned_returns(symbol, benchmark=BENCHMARK):
+    # Daily returns for symbol and benchmark on the dates both traded
+    close = data_store.load_history(symbol)['Close']
+    bench = data_store.load_history(benchmark)['Close']
+    joined = pd.concat([close, bench], axis=1, join='inner', keys=['symbol', 'benchmark']).dropna()
+    dates = joined.index[1:]
+    return dates, daily_returns(joined['symbol']), daily_returns(joined['benchmark']), joined['symbol'].to_numpy()
+
+
+def compute_risk_metrics(symbol, window=TRADING_DAYS, risk_free=0.0, benchmark=BENCHMARK):
+    """Risk metrics over the trailing window plus rolling beta and volatility series.
+
+    Results are cached per (symbol, window) and recomputed only when the stored history of the symbol or the
+    benchmark changes.
+    """
+    key = (symbol, window, risk_free, benchmark)
+    # Bring both stores up to date first so the version read below is the one the metrics are computed from
+    data_store.refresh_history(symbol)
+    data_store.refresh_history(benchmark)
+    version = (data_store.history_version(symbol), data_store.history_version(benchmark))
+    with telemetry.span('risk_metrics', symbol=symbol) as span:
+        span['cache'] = 'hit'
+        cached = _cache.get(key, version)
+        if cached is not memory_cache.MISSING:
+            return cached
+        span['cache'] = 'miss'
+        return _cache.put(key, _compute(symbol, window, risk_free, benchmark), version)
+
+
+def _compute(symbol, window, risk_free, benchmark):
+    dates, returns, bench_returns, close = aligned_returns(symbol, benchmark)
+    trailing = returns[-window:]
+    beta = rolling_beta(returns, bench_returns, window)
+    volatility = rolling_volatility(returns, window)
+
+    metrics = {
+        'Symbol': symbol,
+        'Window': window,
+        'Beta': beta[-1] if len(beta) else np.nan,
+        'Volatility': trailing.std(ddof=1) * np.sqrt(TRADING_DAYS) if len(trailing) > 1 else np.nan,
+        'Max Drawdown': max_drawdown(close[-window - 1:]),
+        'Sharpe': sharpe_ratio(trailing, risk_free) if len(trailing) > 1 else np.nan,
+        'Sortino': sortino_ratio(trailing, risk_free) if len(trailing) > 1 else np.nan,
+        'VaR 95%': value_at_risk(trailing, 0.95),
+        'VaR 99%': value_at_risk(trailing, 0.99),
+    }
+    rolling = pd.DataFrame({'Beta': beta, 'Volatility': volatility}, index=dates[window - 1:])
+    return metrics, rolling
+
+
+def batch_risk_metrics(symbols, window=TRADING_DAYS, risk_free=0.0):
+    # One row of trailing metrics per symbol. Symbols without usable history are skipped
+    rows = []
+    for symbol in symbols:
+        try:
+            metrics, _ = compute_risk_metrics(symbol, window, risk_free)
+        except Exception:
+            continue
+        rows.append(metrics)
+    return pd.DataFrame(rows)
+
+
+###################################################################################################################
+# Yearly Statistics
+###################################################################################################################
+
+_yearly_cache = memory_cache.LRUCache('yearly_statistics')
+
+
+def _aggregate_years(bars, previous_close=None):
+    # One grouped aggregation producing a row per calendar year
+    close = bars['Close']
+    returns = close.pct_change()
+    if previous_close is not None and len(close):
+        returns.iloc[0] = close.iloc[0] / previous_close - 1
+    year = bars.index.year
+    frame = pd.DataFrame({
+        'Growth': returns.fillna(0) + 1,
+        'Daily Return': returns,
+        'Drawdown': close / close.groupby(year).cummax() - 1,
+        'Volume': bars['Volume'],
+    }, index=bars.index)
+
+    yearly = frame.groupby(year).agg(**{
+        'Return': ('Growth', 'prod'),
+        'Volatility': ('Daily Return', 'std'),
+        'Max Drawdown': ('Drawdown', 'min'),
+        'Avg Volume': ('Volume', 'mean'),
+        'Best Day': ('Daily Return', 'max'),
+        'Worst Day': ('Daily Return', 'min'),
+        'Trading Days': ('Volume', 'size'),
+    })
+    yearly['Return'] = yearly['Return'] - 1
+    yearly['Volatility'] = yearly['Volatility'] * np.sqrt(TRADING_DAYS)
+    yearly.index.name = 'Year'
+    return yearly
+
+
+def yearly_statistics(symbol):
+    """Per-year return, volatility, max drawdown, average volume and best/worst day for symbol.
+
+    Completed years are cached per symbol. When only bars in the current year changed, just that year's row is
+    recomputed and the earlier rows are reused. Nothing is recomputed while the stored history is unchanged.
+    """
+    data_store.refresh_history(symbol)
+    version = data_store.history_version(symbol)
+    cached = _yearly_cache.get(symbol)
+    if cached is not memory_cache.MISSING and cached[0] == version:
+        return cached[2]
+
+    bars = data_store.load_history(symbol)[['Close', 'Volume']]
+    if bars.empty:
+        return pd.DataFrame()
+
+    current_year = bars.index[-1].year
+    prior = bars[bars.index.year < current_year]
+    # Fingerprint of the completed years: row count plus the last completed close catches appends and re-adjustments
+    fingerprint = (len(prior), prior['Close'].iloc[-1] if len(prior) else None)
+
+    if cached is not memory_cache.MISSING and cached[1] == fingerprint:
+        completed = cached[2][cached[2].index < current_year]
+        latest = _aggregate_years(bars[bars.index.year == current_year], fingerprint[1])
+        yearly = pd.concat([completed, latest])
+    else:
+        yearly = _aggregate_years(bars)
+
+    _yearly_cache.put(symbol, (version, fingerprint, yearly))
+    return yearly
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compute risk metrics for every symbol in the NASDAQ universe.')
+    parser.add_argument('--window', type=int, default=TRADING_DAYS, help='trailing window in trading days')
+    parser.add_argument('--risk-free', type=float, default=0.0, help='annual risk free rate, e.g. 0.02')
+    args = parser.parse_args()
+
+    start_exec = time.time()
+    table = batch_risk_metrics(data_store.load_universe()['Symbol'].dropna().astype(str), args.window, args.risk_free)
+    table.to_pickle(data_store.cache_path('risk_metrics_%s.pkl' % args.window))
+    print("Computed risk metrics for {} symbols in {} seconds".format(len(table), round(time.time() - start_exec, 2)))
@@ -0,0 +1,131 @@
+import argparse
+import operator
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import data_store
+
+
+###################################################################################################################
+# Fundamentals Screener
+###################################################################################################################
+
+SNAPSHOT_FILE = 'snapshots.pkl'
+LABEL_COLUMNS = ['Symbol', 'Name', 'Sector', 'Industry']
+
+OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+
+def build_snapshots(universe, workers=8):
+    # Batch job: fetch the fundamentals snapshot for every symbol in the universe and store it as one table
+    symbols = universe['Symbol'].dropna().astype(str).tolist()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        rows = list(pool.map(data_store.fetch_snapshot, symbols))
+
+    snapshots = pd.DataFrame(rows, columns=['Symbol'] + data_store.SNAPSHOT_FIELDS)
+    labels = universe[[c for c in LABEL_COLUMNS if c in universe.columns]].drop_duplicates('Symbol')
+    table = labels.merge(snapshots, on='Symbol', how='inner')
+    table[data_store.SNAPSHOT_FIELDS] = table[data_store.SNAPSHOT_FIELDS].astype('float64')
+
+    table.to_pickle(data_store.cache_path(SNAPSHOT_FILE))
+    return table
+
+
+def load_snapshots():
+    # Most recent snapshot table written by `build_snapshots`, or None if the batch job has not run yet
+    try:
+        return pd.read_pickle(data_store.cache_path(SNAPSHOT_FILE))
+    except (IOError, OSError):
+        return None
+
+
+class Screener:
+    """Filters and sorts the snapshot table with vectorised predicates.
+
+    Each numeric column is held as a numpy array. The first range query on a column builds a sorted index
+    (sorted values plus the row order) so later queries are two binary searches instead of a full scan.
+    """
+
+    def __init__(self, table):
+        self.table = table.reset_index(drop=True)
+        self.columns = {c: self.table[c].to_numpy() for c in self.table.columns}
+        self._indexes = {}
+
+    def __len__(self):
+        return len(self.table)
+
+    def sorted_index(self, column):
+        if column not in self._indexes:
+            values = self.columns[column].astype('float64')
+            valid = np.flatnonzero(~np.isnan(values))
+            order = valid[np.argsort(values[valid], kind='mergesort')]
+            self._indexes[column] = (values[order], order)
+        return self._indexes[column]
+
+    def range_mask(self, column, low=None, high=None, include_low=True, include_high=True):
+        # Rows where low <(=) column <(=) high. NaNs never match
+        values, order = self.sorted_index(column)
+        start = 0
+        stop = len(values)
+        if low is not None:
+            start = np.searchsorted(values, low, side='left' if include_low else 'right')
+        if high is not None:
+            stop = np.searchsorted(values, high, side='right' if include_high else 'left')
+        mask = np.zeros(len(self), dtype=bool)
+        mask[order[start:stop]] = True
+        return mask
+
+    def condition_mask(self, column, op, value):
+        if op in ('<', '<='):
+            return self.range_mask(column, high=value, include_high=op == '<=')
+        if op in ('>', '>='):
+            return self.range_mask(column, low=value, include_low=op == '>=')
+        if op == '==' and column not in LABEL_COLUMNS:
+            return self.range_mask(column, low=value, high=value)
+        mask = OPERATORS[op](self.columns[column], value)
+        if column not in LABEL_COLUMNS:
+            mask &= ~np.isnan(self.columns[column].astype('float64')) # NaNs never match, != included
+        return mask
+
+    def query(self, conditions=(), sectors=None, industries=None, sort_by=None, ascending=True, limit=None):
+        # conditions is a list of (column, operator, value), e.g. [('trailingPE', '<', 15), ('dividendYield', '>', 3)]
+        mask = np.ones(len(self), dtype=bool)
+        for column, op, value in conditions:
+            mask &= self.condition_mask(column, op, value)
+        if sectors:
+            mask &= np.isin(self.columns['Sector'], list(sectors))
+        if industries:
+            mask &= np.isin(self.columns['Industry'], list(industries))
+
+        rows = np.flatnonzero(mask)
+        if sort_by is not None:
+            # Walk the column's sorted index and keep the rows that passed, so sorting needs no extra argsort
+            _, order = self.sorted_index(sort_by)
+            ranked = order[mask[order]]
+            missing = np.setdiff1d(rows, ranked, assume_unique=True)
+            if not ascending:
+                ranked = ranked[::-1]
+            rows = np.concatenate([ranked, missing])
+        if limit is not None:
+            rows = rows[:limit]
+        return self.table.iloc[rows]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Collect fundamentals snapshots for the whole NASDAQ universe.')
+    parser.add_argument('--workers', type=int, default=8, help='number of concurrent info requests')
+    args = parser.parse_args()
+
+    start_exec = time.time()
+    table = build_snapshots(data_store.load_universe(), workers=args.workers)
+    print("Stored {} snapshots in {} seconds".format(len(table), round(time.time() - start_exec, 2)))
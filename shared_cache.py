@@ -0,0 +1,221 @@
+import contextlib
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+import paths
+
+
+###################################################################################################################
+# Shared Cache
+###################################################################################################################
+
+# Every app process, batch job and API worker on the host reads and writes the same entries, so an upstream
+# fetch done by one of them is reused by all the others. 'sqlite' keeps everything in one database file,
+# 'file' writes one pickle per key for setups where SQLite locking is a problem (e.g. network filesystems)
+BACKEND = os.environ.get('STOCK_APP_CACHE_BACKEND', 'sqlite')
+SCHEMA_VERSION = 1 # bump when the layout of cached values changes, older entries are then ignored
+LOCK_TIMEOUT = 60 # seconds a fetch may hold a key's lock before other processes stop waiting for it
+PRUNE_AFTER = 7 * 24 * 60 * 60 # entries not rewritten for this long are deleted when a process opens the cache
+
+MISSING = object()
+
+logger = logging.getLogger('stock_app.shared_cache')
+lock_timeouts = 0 # waits that gave up on another process's fetch lock, each one a possible duplicate fetch
+
+
+class SQLiteBackend:
+    """One table of (key, version, stored, value) rows in a WAL mode database.
+
+    Each write is a single INSERT OR REPLACE, so readers see either the old or the new entry. Fetch locks are
+    rows in a second table, claimed with INSERT OR IGNORE.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+
+    def _connection(self):
+        # sqlite3 connections can't be shared across threads, keep one per thread
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, version TEXT, stored REAL, value BLOB)')
+            connection.execute('CREATE TABLE IF NOT EXISTS locks (key TEXT PRIMARY KEY, expires REAL)')
+            self.local.connection = connection
+        return connection
+
+    def get(self, key):
+        row = self._connection().execute('SELECT version, stored, value FROM cache WHERE key = ?', (key,)).fetchone()
+        return None if row is None else (row[0], row[1], bytes(row[2]))
+
+    def set(self, key, version, stored, blob):
+        self._connection().execute('INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)', (key, version, stored, blob))
+
+    def delete(self, key):
+        self._connection().execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def prune(self, before):
+        self._connection().execute('DELETE FROM cache WHERE stored < ?', (before,))
+
+    def try_lock(self, key, timeout):
+        connection = self._connection()
+        now = time.time()
+        connection.execute('DELETE FROM locks WHERE key = ? AND expires < ?', (key, now))
+        return connection.execute('INSERT OR IGNORE INTO locks VALUES (?, ?)', (key, now + timeout)).rowcount == 1
+
+    def unlock(self, key):
+        self._connection().execute('DELETE FROM locks WHERE key = ?', (key,))
+
+
+class FileBackend:
+    """One pickle per key under a directory. Writes go to a temporary file that is renamed into place."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, suffix='.pkl'):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + suffix)
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                return pickle.load(f)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def set(self, key, version, stored, blob):
+        path = self._path(key)
+        tmp = '%s.%s.%s.tmp' % (path, os.getpid(), threading.get_ident())
+        with open(tmp, 'wb') as f:
+            pickle.dump((version, stored, blob), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def prune(self, before):
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if name.endswith('.pkl') and os.path.getmtime(path) < before:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def try_lock(self, key, timeout):
+        path = self._path(key, '.lock')
+        try:
+            if time.time() - os.path.getmtime(path) > timeout:
+                os.remove(path) # left behind by a process that died mid fetch
+        except OSError:
+            pass
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            return False
+        return True
+
+    def unlock(self, key):
+        try:
+            os.remove(self._path(key, '.lock'))
+        except OSError:
+            pass
+
+
+BACKENDS = {
+    'sqlite': lambda: SQLiteBackend(paths.cache_path('shared_cache.sqlite')),
+    'file': lambda: FileBackend(os.path.dirname(paths.cache_path('shared', 'x'))),
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = BACKENDS[BACKEND]()
+            _backend.prune(time.time() - PRUNE_AFTER)
+        return _backend
+
+
+def _full_key(key):
+    # Keys are tuples or strings. The schema version is part of every key
+    return repr((SCHEMA_VERSION, key))
+
+
+def get(key, version=None, ttl=None):
+    """Cached value for key, or MISSING when there is none, it was stored under another version or is older than ttl."""
+    entry = get_backend().get(_full_key(key))
+    if entry is None or entry[0] != repr(version):
+        return MISSING
+    if ttl is not None and time.time() - entry[1] > ttl:
+        return MISSING
+    try:
+        return pickle.loads(entry[2])
+    except Exception:
+        return MISSING
+
+
+def put(key, value, version=None):
+    get_backend().set(_full_key(key), repr(version), time.time(), pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def delete(key):
+    get_backend().delete(_full_key(key))
+
+
+@contextlib.contextmanager
+def lock(key, timeout=LOCK_TIMEOUT):
+    """Hold key's fetch lock across every process sharing the cache.
+
+    Waits for another holder to finish, but never longer than timeout: after that the caller goes ahead
+    without the lock rather than blocking the page. Yields whether the lock was acquired, and every timeout
+    is logged and counted in lock_timeouts.
+    """
+    global lock_timeouts
+    backend = get_backend()
+    name = _full_key(key)
+    deadline = time.time() + timeout
+    acquired = backend.try_lock(name, timeout)
+    while not acquired and time.time() < deadline:
+        time.sleep(0.1)
+        acquired = backend.try_lock(name, timeout)
+    if not acquired:
+        lock_timeouts += 1
+        logger.warning('Gave up waiting %ss for the fetch lock on %s, going ahead without it', timeout, name)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            backend.unlock(name)
+
+
+def cached(key, fetch, ttl=None, version=None):
+    """Value for key from the shared cache, calling fetch() to fill it on a miss.
+
+    Only one process fetches a given key at a time. The others wait for its result instead of sending the
+    same request upstream. The cache is checked again once the wait is over, also when it timed out, so a
+    waiter only fetches if the holder has not stored a value by then.
+    """
+    value = get(key, version, ttl)
+    if value is not MISSING:
+        return value
+    with lock(key):
+        value = get(key, version, ttl)
+        if value is MISSING:
+            value = fetch()
+            put(key, value, version)
+    return value
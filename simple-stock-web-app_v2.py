@@ -1,12 +1,29 @@
 from altair.vegalite.v4.schema.channels import Tooltip
-import pandas as pd
 import plotly.graph_objs as go
 import altair as alt
 import streamlit as st
-import yfinance as yf
 import datetime
+import os
 import time
 from dateutil.relativedelta import relativedelta # to add days or years
+from streamlit.report_thread import get_report_ctx
+
+import alerts
+import anomalies
+import charts
+import data_store
+import financials
+import fundamentals_history
+import intraday
+import market_overview
+import options_chain
+import peers
+import quotes
+import risk_metrics
+import screener
+import telemetry
+import ticker_summary
+import watchlist
 
 
 ###################################################################################################################
@@ -64,6 +81,20 @@ def main():
     - Expand accordions to see additional data
     - Charts are interactive. Zoom in, zoom out. Double click to reset
     ''')
+    page = st.sidebar.radio('Page', ['Ticker Research', 'Watchlist', 'Market Overview', 'Stock Screener'])
+
+    if page != 'Ticker Research':
+        if page == 'Watchlist':
+            get_watchlist(get_data())
+        elif page == 'Market Overview':
+            get_market_overview(get_data())
+        else:
+            get_screener()
+        get_credits()
+        record_page(page, start_exec)
+        st.sidebar.text("Execution time: {} seconds".format(round(time.time() - start_exec,2)))
+        return None
+
     st.sidebar.subheader('Query Parameters')
 
     # Variables
@@ -75,6 +106,12 @@ def main():
         start_date = col1.date_input("Start date", start)
         end_date = col2.date_input("End date", end)
 
+    # Intraday bars replace the daily history charts and keep updating while the page is open
+    bars = st.sidebar.radio('Bars', ['Daily', 'Intraday'])
+    interval = st.sidebar.selectbox('Interval', list(intraday.INTERVALS)) if bars == 'Intraday' else None
+    live = st.sidebar.checkbox('Live quotes', value=True)
+    adjusted = st.sidebar.checkbox('Split/dividend adjusted prices', value=True)
+
     # Call function to pull in NASDAQ stock data
     ticker_list = get_data()
 
@@ -90,10 +127,7 @@ def main():
     st.write("")
 
     # Get ticker symbol from list of available tickers
-    ticker_symbol = ticker_list[['Symbol', 'Name']]
-    ticker_symbol['Name'] = ticker_list['Symbol'] + " | " + ticker_list['Name']
-
-    records = ticker_symbol.to_dict("records")
+    ticker_symbol = get_ticker_names()
 
     # selected_Data = st.selectbox("Select from df", options=records, format_func=)
     #st.write(selected_Data)
@@ -105,296 +139,184 @@ def main():
 
     tickerSymbol = tickerSymbol.split(" | ")[0]
 
+    # Alert rules for the selected ticker and any alerts that have fired
+    get_alerts(tickerSymbol)
+
     # Call function to return historical price and volume data for ticker
-    get_ticker_data(tickerSymbol, start_date, end_date)
+    updaters, subscriptions = get_ticker_data(tickerSymbol, start_date, end_date, interval, live, adjusted)
 
     # Call function to give shoutout to development team!
     get_credits()
 
+    record_page(page, start_exec, symbol=tickerSymbol)
     sb_placeholder.text("Execution time: {} seconds".format(round(time.time() - start_exec,2)))
 
+    # Keep live quotes and intraday bars updating until the user changes a widget or leaves the page
+    if updaters:
+        stream_updates(updaters, subscriptions)
+
     return None
 
-@st.cache
+
+def record_page(page, start_exec, **fields):
+    # Whole-run timing next to the per-stage spans, and a fresh metrics file for the node_exporter textfile collector
+    telemetry.observe('page', time.time() - start_exec, dict(fields, page=page))
+    telemetry.write_textfile(data_store.cache_path('metrics.prom'))
+
+@st.cache(allow_output_mutation=True) # read-only by convention, skips hashing the whole list on every rerun
 def get_data():
-    data = pd.read_csv('https://raw.githubusercontent.com/ericttran3/yfinance-web-scraper/main/data/nasdaq-stock-tickers.csv')
+    data = data_store.load_universe()
     #df = data[data['Market Cap'] > 0].sort_values('Market Cap', ascending=False) # Filter for companies with market cap greater than 0
     return data
 
 
-def get_ticker_data(symbol, start_date, end_date):
-    tickerData = yf.Ticker(symbol) # Get ticker data
-
-    # Extract Attributes from API Payload
-    try:
-        logo = tickerData.info['logo_url']
-    except:
-        logo = None
-
-    try:
-        company_name = tickerData.info['longName']
-    except:
-        company_name = 'N/A'
-
-    try:
-        country = tickerData.info['country']
-    except:
-        country = 'N/A'
-
-    try:
-        sector = tickerData.info['sector']
-    except:
-        sector = 'N/A'
-
-    try:
-        industry = tickerData.info['industry']
-    except:
-        industry = 'N/A'
-
-    try:
-        market = tickerData.info['market']
-    except:
-        market = 'N/A'
-
-    try:
-        employees = tickerData.info['fullTimeEmployees']
-    except:
-        employees = 'N/A'
-    
-    try:
-        website = tickerData.info['website']
-    except:
-        website = 'N/A'
-
-    # Ticker information
-    string_logo = '<img src=%s>' % tickerData.info['logo_url']
-    st.markdown(string_logo, unsafe_allow_html=True)
-
-    string_name = tickerData.info['longName']
-    st.header('**%s**' % string_name)
-    st.markdown('''
-    Country: `{country}` | Sector: `{sector}` | Industry: `{industry}` | Market: `{market}` | Employees: `{employees}` | Website: `{website}`
-    '''.format(country=country, sector=sector, industry=industry, market=market, employees=employees, website=website
-    ))
-    st.write(tickerData.info['longBusinessSummary'])
-
-    #st.subheader('Ticker Summary')
-    expander_bar = st.beta_expander("Ticker Summary")
-    with expander_bar.beta_container():
-        col1, col2, col3, col4 = st.beta_columns(4)
-
-        # Store values from API call in variables. Add error handling
-        try:
-            price = tickerData.info['regularMarketPrice']
-        except:
-            price = ""
-
-        try:
-            previous_close = round(tickerData.info['previousClose'],2)
-        except:
-            previous_close = ""
-
-        try: 
-            high = round(tickerData.info['regularMarketDayHigh'],2)
-        except:
-            high = ""
-
-        try: 
-            low = round(tickerData.info['regularMarketDayLow'],2)
-        except:
-            low = ""      
-
-        try:
-            high_52 = round(tickerData.info['fiftyTwoWeekHigh'],2)
-        except:
-            high_52 = ""
-            
-        try:
-            low_52 = round(tickerData.info['fiftyTwoWeekLow'],2)
-        except:
-            low_52 = ""
-
-        try:
-            change_52 = round(tickerData.info['52WeekChange']*100,2)
-        except:
-            change_52 = ""                    
-
-        try:
-            change_52_snp = round(tickerData.info['SandP52WeekChange']*100,2)
-        except:
-            change_52_snp = ""   
-
-        try:
-            ma_50 = round(tickerData.info['fiftyDayAverage'],2)
-        except:
-            ma_50 = ""  
-
-        try:
-            ma_200 = round(tickerData.info['twoHundredDayAverage'],2)
-        except:
-            ma_200 = ""               
-
-        try:
-            market_cap = tickerData.info['marketCap']
-        except:
-            market_cap = ""               
-
-        try:
-            beta = round(tickerData.info['beta'],2)
-        except:
-            beta = ""
-
-        try:
-            pe_ratio = round(tickerData.info['trailingPE'],2)
-        except:
-            pe_ratio = ""
-
-        try:
-            eps = round(tickerData.info['trailingEps'],2)
-        except:
-            eps = ""
-
-        try:
-            peg_ratio = round(tickerData.info['pegRatio'],2)
-        except:
-            peg_ratio = ""
-
-        try:
-            price_to_sale = round(tickerData.info['priceToSalesTrailing12Months'],2)
-        except:
-            price_to_book = ""
+@st.cache(allow_output_mutation=True)
+def get_ticker_names():
+    # "SYMBOL | Name" labels for the ticker selectbox, built once rather than on every rerun
+    ticker_list = get_data()
+    ticker_symbol = ticker_list[['Symbol', 'Name']].copy()
+    ticker_symbol['Name'] = ticker_list['Symbol'] + " | " + ticker_list['Name']
+    return ticker_symbol
 
-        try:
-            price_to_book = round(tickerData.info['priceToBook'],2)
-        except:
-            price_to_book = ""
 
-        try:
-            enterprise_value = round(tickerData.info['enterpriseToRevenue'],2)
-        except:
-            enterprise_value = ""
+STATUS_INTERVAL = 1 # longest a live page goes without an st call, and so without noticing a rerun or a closed tab
 
-        try:
-            ebitda = round(tickerData.info['enterpriseToEbitda'],2)
-        except:
-            ebitda = ""
-
-        try:
-            profit = round(tickerData.info['profitMargins']*100,2)
-        except:
-            profit = ""
+# Ticker Summary tables that are re-rendered in place when live quotes arrive
+TECHNICAL_TABLE = """
+            |  | |
+            | :- | :- | :- |
+            | Price | `{price}`            
+            | Previous Close | `{previous_close}` 
+            | Today's Range | `{low}` - `{high}`
+            | 52 Week Range | `{low_52}` - `{high_52}`
+            | 52 Week /\ | `{change_52}%` 
+            | S&P500 52 /\ | `{change_52_snp}%` 
+            | 50 Day MA | `{ma_50}` 
+            | 200 Day MA | `{ma_200}` 
+            """
 
-        try:
-            net_income = round(tickerData.info['netIncomeToCommon'],2)
-        except:
-            net_income = ""
+HOLDINGS_TABLE = """
+            |  | |
+            | :- | :- | :- |
+            | Volume | `{volume}`             
+            | Avg Volume (3Mo) | `{avg_vol_3mo}`
+            | Avg Volume (10Day) | `{avg_vol_10day}` 
+            | Shares Outstanding | `{shares_outstanding}`
+            | Shares Float | `{shares_float}`
+            | % Held by Insiders | `{pct_insiders}%`
+            | % Held by Institutions | `{pct_institutions}%`
+            | Shares Short | `{shares_short}`
+            | Shares Short Ratio | `{shares_short_ratio}%`
+            | Short Pct Float | `{short_pct_float}%`
+            | Shares Short (PM)| `{shares_short_pm}`
+            """
+
+
+def get_ticker_data(symbol, start_date, end_date, interval=None, live=False, adjusted=True):
+    # Every section gets its slot up front so the page takes its final shape at once. The slots are then
+    # filled cheapest first: sections whose data is already cached go before the ones that must download.
+    # Each st.empty() slot is replaced by a multi-element container, as the st.empty docs of 0.71 show
+    slots = {}
+    for name, label in [('header', 'ticker information'), ('summary', 'ticker summary'), ('dictionary', 'data dictionary'),
+                        ('additional', 'additional information'), ('similar', 'similar stocks'), ('options', 'options'),
+                        ('statements', 'financial statements'), ('history', 'price history')]:
+        slots[name] = st.empty()
+        slots[name].text('Loading {}...'.format(label))
+
+    history_ready = interval is None and data_store.history_is_current(symbol, start_date)
+    stages = [
+        ('ticker_info', data_store.info_is_cached(symbol), lambda: fill_ticker_info(symbol, slots)),
+        ('local_sections', True, lambda: fill_local_sections(symbol, slots)),
+        ('price_history', history_ready, lambda: fill_price_history(symbol, slots, start_date, end_date, interval, adjusted)),
+    ]
+    results = [None] * len(stages)
+    for i in sorted(range(len(stages)), key=lambda i: not stages[i][1]):
+        name, ready, fill = stages[i]
+        with telemetry.span('render', section=name, symbol=symbol, ready=ready):
+            results[i] = fill()
+    summary, technical_placeholder, holdings_placeholder = results[0]
+
+    # Callables run on every live tick by stream_updates, and the quote subscriptions it releases when it stops
+    updaters, subscriptions = [], []
+    if live:
+        update, token = get_live_quote(symbol, summary, technical_placeholder, holdings_placeholder)
+        updaters.append(update)
+        subscriptions.append(token)
+    if results[2] is not None:
+        updaters.append(results[2])
+    return updaters, subscriptions
+
+
+def fill_ticker_info(symbol, slots):
+    # Everything drawn from the provider's info payload
+    info = data_store.load_info(symbol) # Get ticker data
 
-        try:
-            payout = round(tickerData.info['payoutRatio']*100,2)
-        except:
-            payout = ""
-        
-        try:
-            dividend_rate = round(tickerData.info['dividendRate'],2)
-        except:
-            dividend_rate = ""
+    # Extract Attributes from API Payload
+    summary = ticker_summary.get_summary(info)
 
-        try:
-            dividend_yield = round(tickerData.info['dividendYield']*100,2)
-        except:
-            dividend_yield = ""
+    with slots['header'].beta_container():
+        get_ticker_header(info, summary)
+    with slots['summary'].beta_container():
+        technical_placeholder, holdings_placeholder = get_ticker_summary(symbol, summary)
+    with slots['dictionary'].beta_container():
+        get_data_dictionary(summary)
+    with slots['additional'].beta_container():
+        get_additional_information(info)
+    with slots['options'].beta_container():
+        get_options(symbol, summary['price'])
+    return summary, technical_placeholder, holdings_placeholder
 
-        try:
-            forward_eps = round(tickerData.info['forwardEps'],2)
-        except:
-            forward_eps = ""
 
-        try:
-            trailing_pe = round(tickerData.info['trailingPE'],2)
-        except:
-            trailing_pe = ""
+def fill_local_sections(symbol, slots):
+    # Sections served from local indexes and stores
+    with slots['similar'].beta_container():
+        get_similar_stocks(symbol)
+    with slots['statements'].beta_container():
+        get_financial_statements(symbol)
 
-        try:
-            forward_pe = round(tickerData.info['forwardPE'],2)
-        except:
-            forward_pe = ""
-        
-        try:
-            earnings_growth = round(tickerData.info['earningsQuarterlyGrowth']*100,2)
-        except:
-            earnings_growth = ""
 
-        try:
-            volume = tickerData.info['regularMarketVolume']
-        except:
-            volume = ""
+def fill_price_history(symbol, slots, start_date, end_date, interval, adjusted):
+    # Daily history with its statistics and charts, or intraday bars. Returns the intraday updater if any
+    with slots['history'].beta_container():
+        if interval is not None:
+            return get_intraday(symbol, interval)
 
-        try:
-            avg_vol_3mo = tickerData.info['averageVolume']
-        except:
-            avg_vol_3mo = ""
+        # Get historical stock price for the data range with periods. Reused across reruns until new bars arrive
+        tickerDf = charts.ticker_charts(symbol, start_date, end_date, adjusted)
 
-        try:
-            avg_vol_10day = tickerData.info['averageVolume10days']
-        except:
-            avg_vol_10day = ""
+        get_risk_metrics(symbol)
 
-        try:
-            shares_outstanding = tickerData.info['sharesOutstanding']
-        except:
-            shares_outstanding = ""
+        get_yearly_statistics(symbol, start_date, end_date)
 
-        try:
-            shares_float = tickerData.info['floatShares']
-        except:
-            shares_float = ""
+        expander_bar = st.beta_expander("Corporate Actions")
+        expander_bar.dataframe(data_store.load_actions(symbol).sort_index(ascending=False))
 
-        try:
-            pct_insiders = round(tickerData.info['heldPercentInsiders']*100,2)
-        except:
-            pct_insiders = ""
+        get_visualizations(tickerDf)
+    return None
 
-        try:
-            pct_institutions = round(tickerData.info['heldPercentInstitutions']*100,2)
-        except:
-            pct_institutions = ""
 
-        try:
-            shares_short = tickerData.info['sharesShort']
-        except:
-            shares_short = ""
+def get_ticker_header(info, summary):
+    # Ticker information
+    string_logo = '<img src=%s>' % info['logo_url']
+    st.markdown(string_logo, unsafe_allow_html=True)
 
-        try:
-            shares_short_ratio = round(tickerData.info['shortRatio'],2)
-        except:
-            shares_short_ratio = ""
+    string_name = info['longName']
+    st.header('**%s**' % string_name)
+    st.markdown('''
+    Country: `{country}` | Sector: `{sector}` | Industry: `{industry}` | Market: `{market}` | Employees: `{employees}` | Website: `{website}`
+    '''.format(**summary))
+    st.write(info['longBusinessSummary'])
 
-        try:
-            short_pct_float = round(tickerData.info['shortPercentOfFloat']*100,2)
-        except:
-            short_pct_float = ""
-        
-        try:
-            shares_short_pm = tickerData.info['sharesShortPriorMonth']
-        except:
-            shares_short_pm = ""
 
+def get_ticker_summary(symbol, summary):
+    #st.subheader('Ticker Summary')
+    expander_bar = st.beta_expander("Ticker Summary")
+    with expander_bar.beta_container():
+        col1, col2, col3, col4 = st.beta_columns(4)
 
         col1.subheader('Technical')
-        col1.markdown("""
-            |  | |
-            | :- | :- | :- |
-            | Price | `{price}`            
-            | Previous Close | `{previous_close}` 
-            | Today's Range | `{low}` - `{high}`
-            | 52 Week Range | `{low_52}` - `{high_52}`
-            | 52 Week /\ | `{change_52}%` 
-            | S&P500 52 /\ | `{change_52_snp}%` 
-            | 50 Day MA | `{ma_50}` 
-            | 200 Day MA | `{ma_200}` 
-            """.format(price=price, previous_close=previous_close, high=high, low=low, high_52=high_52, 
-                        low_52=low_52, change_52=change_52, change_52_snp=change_52_snp,  ma_50=ma_50, ma_200=ma_200
-        ))
+        technical_placeholder = col1.empty()
+        technical_placeholder.markdown(TECHNICAL_TABLE.format(**summary))
 
         col2.subheader('Valuation')
         col2.markdown("""
@@ -409,10 +331,7 @@ def get_ticker_data(symbol, start_date, end_date):
             | Price to Book | `{price_to_book}`
             | Enterprise Value| `{enterprise_value}` 
             | Enterprise EBITDA| `{ebitda}` 
-            """.format(market_cap=market_cap, beta=beta, pe_ratio=pe_ratio, eps=eps, peg_ratio=peg_ratio, 
-                        price_to_sale=price_to_sale, price_to_book=price_to_book, enterprise_value=enterprise_value, 
-                        ebitda=ebitda
-        ))
+            """.format(**summary))
 
         col3.subheader('Fundamentals')
         col3.markdown("""
@@ -427,214 +346,443 @@ def get_ticker_data(symbol, start_date, end_date):
             | Trailing PE | `{trailing_pe}`
             | Forward PE | `{forward_pe}`
             | Earnings Growth | `{earnings_growth}%`
-            """.format(profit=profit, net_income=net_income, payout=payout, dividend_rate=dividend_rate, 
-                        dividend_yield=dividend_yield, forward_eps=forward_eps, trailing_pe=trailing_pe,
-                        forward_pe=forward_pe, earnings_growth=earnings_growth)
-        )
+            """.format(**summary))
 
         col4.subheader('Holdings')
-        col4.markdown("""
-            |  | |
-            | :- | :- | :- |
-            | Volume | `{volume}`             
-            | Avg Volume (3Mo) | `{avg_vol_3mo}`
-            | Avg Volume (10Day) | `{avg_vol_10day}` 
-            | Shares Outstanding | `{shares_outstanding}`
-            | Shares Float | `{shares_float}`
-            | % Held by Insiders | `{pct_insiders}%`
-            | % Held by Institutions | `{pct_institutions}%`
-            | Shares Short | `{shares_short}`
-            | Shares Short Ratio | `{shares_short_ratio}%`
-            | Short Pct Float | `{short_pct_float}%`
-            | Shares Short (PM)| `{shares_short_pm}`
-            """.format(volume=volume, avg_vol_3mo=avg_vol_3mo, avg_vol_10day=avg_vol_10day, 
-                        shares_outstanding=shares_outstanding, shares_float=shares_float, pct_insiders=pct_insiders, 
-                        pct_institutions=pct_institutions, shares_short=shares_short, shares_short_ratio=shares_short_ratio, 
-                        short_pct_float=short_pct_float, shares_short_pm=shares_short_pm)
-        )
+        holdings_placeholder = col4.empty()
+        holdings_placeholder.markdown(HOLDINGS_TABLE.format(**summary))
+
+        # How any of the metrics above evolved, from the daily snapshot store
+        field = st.selectbox('Metric history', data_store.SNAPSHOT_FIELDS,
+                             index=data_store.SNAPSHOT_FIELDS.index('trailingPE'))
+        history = fundamentals_history.metric_history(symbol, field).dropna()
+        if len(history):
+            history = history.rename_axis('Date').reset_index()
+            st.altair_chart(alt.Chart(history).mark_line().encode(
+                x=alt.X('Date', axis=alt.Axis(title='')),
+                y=alt.Y(field, axis=alt.Axis(title=''), scale=alt.Scale(zero=False)),
+                tooltip=['Date', field]
+            ), use_container_width=True)
+        else:
+            st.text('No stored snapshots for {} yet. Run `python fundamentals_history.py` daily to build them.'.format(symbol))
         st.write("")
         st.write("")
 
-    expander_bar = st.beta_expander("Data Dictionary")
-    expander_bar.markdown("""
-    All definitions are provided by [Investopedia](https://www.investopedia.com)
-
-    | Attribute | Value | Definition |
-    | :- | :- | :- |
-    | Sector | {sector} | A sector is an area of the economy in which businesses share the same or a related product or service. |
-    | Industry | {industry} | The term industry refers to a series of companies that operate in a similar business sphere, and its categorization is more narrow. |
-    | Country | {country} | The country the company was originated or does business in. |
-    | Market Cap | {market_cap} | Market capitalization refers to the total dollar market value of a company's outstanding shares of stock. Commonly referred to as "market cap," it is calculated by multiplying the total number of a company's outstanding shares by the current market price of one share. |
-    | Beta | {beta} | Beta is a measure of the volatility—or systematic risk—of a security or portfolio compared to the market as a whole.  |    
-    | P/E Ratio | {pe_ratio} | The price-to-earnings ratio (P/E ratio) is the ratio for valuing a company that measures its current share price relative to its per-share earnings (EPS). The price-to-earnings ratio is also sometimes known as the price multiple or the earnings multiple.  |    
-    | EPS | {eps} | Earnings per share (EPS) is calculated as a company's profit divided by the outstanding shares of its common stock. The resulting number serves as an indicator of a company's profitability.  |    
-    | PEG Ratio | {peg_ratio} | The price/earnings to growth ratio (PEG ratio) is a stock's price-to-earnings (P/E) ratio divided by the growth rate of its earnings for a specified time period. The PEG ratio is used to determine a stock's value while also factoring in the company's expected earnings growth, and it is thought to provide a more complete picture than the more standard P/E ratio.  |    
-    | P/S Ratio | {price_to_sale} | The price-to-sales (P/S) ratio is a valuation ratio that compares a company’s stock price to its revenues. It is an indicator of the value that financial markets have placed on each dollar of a company’s sales or revenues.  |    
-    | P/B Ratio | {price_to_book} | Companies use the price-to-book ratio (P/B ratio) to compare a firm's market capitalization to its book value. It's calculated by dividing the company's stock price per share by its book value per share (BVPS).  |    
-    | EV/R | {enterprise_value} | The enterprise value-to-revenue multiple (EV/R) is a measure of the value of a stock that compares a company's enterprise value to its revenue. EV/R is one of several fundamental indicators that investors use to determine whether a stock is priced fairly.  |    
-    | EBITDA/EV | {ebitda} | The EBITDA/EV multiple is a financial valuation ratio that measures a company's return on investment (ROI).   |    
-    | Profit Margin | {profit}  | A metric used to gauge how a company or business makes money. Expressed as percentage, profit margin indicatses how many cents of profit has been generated for each dollar of sale. |    
-    | Net Income | {net_income} | Net income (NI), also called net earnings, is calculated as sales minus cost of goods sold, selling, general and administrative expenses, operating expenses, depreciation, interest, taxes, and other expenses.  |    
-    | Dividend Yield | {dividend_yield} | The dividend yield–displayed as a percentage–is the amount of money a company pays shareholders for owning a share of its stock divided by its current stock price.  |    
-    | Dividend Rate | {dividend_rate} | Dividend rate, expressed as a percentage or yield, is a financial ratio that shows how much a company pays out in dividends each year relative to its stock price.  |    
-    | Payout Ratio | {payout} | The payout ratio, also known as the dividend payout ratio, shows the percentage of a company's earnings paid out as dividends to shareholders.  |    
-    | Forward EPS | {forward_eps} | Forward earnings are an estimate of a company's earnings for upcoming periods. Forward earnings project future revenues, margins, tax rates, and other financial data. |    
-    | Trailing PE | {trailing_pe} | Trailing price-to-earnings (P/E) is a relative valuation multiple that is based on the last 12 months of actual earnings. It is calculated by taking the current stock price and dividing it by the trailing earnings per share (EPS) for the past 12 months.  |    
-    | Forward PE | {forward_pe} | Forward price-to-earnings (forward P/E) is a version of the ratio of price-to-earnings (P/E) that uses forecasted earnings for the P/E calculation.  |    
-    | Earnings Growth | {earnings_growth} | Growth rates are used to express the annual change in a variable as a percentage. Growth rates can be beneficial in assessing a company’s performance and to predict future performance.  |    
-    | Volume | {volume} | Volume is the number of shares of a security traded between its daily open and close. Trading volume, and changes to volume over the course of time, are important inputs for technical traders.  |    
-    | Shares Outstanding | {shares_outstanding} | Shares outstanding refer to a company's stock currently held by all its shareholders, including share blocks held by institutional investors and restricted shares owned by the company’s officers and insiders.  |    
-    | Shares Float | {shares_float} | Floating stock refers to the number of shares a company has available to trade in the open market. To calculate a company's floating stock, subtract its restricted stock and closely held shares from its total number of outstanding shares.  |    
-    | % Held by Insiders | {pct_insiders} | Insiders are a company's officers, directors, relatives, or anyone else with access to key company information before it's made available to the public. By watching the trading activity of corporate insiders and large institutional investors, it's easier to get a sense of a stock's prospects. |    
-    | % Held by Institutions | {pct_institutions} | An institutional investor is a company or organization that invests money on behalf of other people. Mutual funds, pensions, and insurance companies are examples.  |    
-    | Shares Short | {shares_short} | A short, or a short position, is created when a trader sells a security first with the intention of repurchasing it or covering it later at a lower price.   |    
-    | Shares Short Ratio | {shares_short_ratio} | The short Interest ratio is a simple formula that divides the number of shares short in a stock by the stock's average daily trading volume. The short interest ratio is a quick way to see how heavily shorted a stock may be versus its trading volume. |    
-    | Short Percent to Float | {short_pct_float} |  When a company's short interest is high (above 40%), it frequently means a large portion of investors anticipate the shares will go down in value and are looking to profit from the decline or are using the short as a hedge against a possible decline. |    
-    | Shares Short Previous Month | {shares_short_pm} |  The number of shares that were shorted in the previous month. This metric can serves as a market sentiment indicator for investors. |    
-    """.format(sector=sector,industry=industry, country=country, market_cap=market_cap, beta=beta,
-                pe_ratio=pe_ratio, eps=eps, peg_ratio=peg_ratio, price_to_sale=price_to_sale, price_to_book=price_to_book,
-                enterprise_value=enterprise_value, ebitda=ebitda, profit=profit, net_income=net_income, dividend_yield=dividend_yield,
-                dividend_rate=dividend_rate, payout=payout, forward_eps=forward_eps, trailing_pe=trailing_pe,
-                forward_pe=forward_pe, earnings_growth=earnings_growth, volume=volume, shares_outstanding=shares_outstanding,
-                shares_float=shares_float, pct_insiders=pct_insiders, pct_institutions=pct_institutions,
-                shares_short=shares_short, shares_short_ratio=shares_short_ratio, short_pct_float=short_pct_float,
-                shares_short_pm=shares_short_pm
-    ))
-    expander_bar.write("")
+    return technical_placeholder, holdings_placeholder
 
-    expander_bar = st.beta_expander("Additional Information")
-    expander_bar.write(tickerData.info)
 
-    # Get historical stock price for the data range with periods 
-    tickerDf = tickerData.history(period='1d', start=start_date, end=end_date) # get the historical prices for this ticker
-    tickerDf['Date'] = tickerDf.index
-    tickerDf['Year'] = pd.DatetimeIndex(tickerDf.index).year
-    tickerDf['Ticker'] = tickerData.info['symbol']
+def get_data_dictionary(summary):
+    # Built and sent only once asked for. The definitions are compiled once per process, only values change
+    expander_bar = st.beta_expander("Data Dictionary")
+    if expander_bar.checkbox('Show definitions'):
+        expander_bar.markdown(ticker_summary.data_dictionary(summary))
+    expander_bar.write("")
 
-    get_visualizations(tickerDf)
 
+def get_additional_information(info):
+    # The raw payload is large, only send it to the browser when asked for
+    expander_bar = st.beta_expander("Additional Information")
+    if expander_bar.checkbox('Show raw provider data'):
+        expander_bar.write(info)
 
-def get_visualizations(tickerDf):
 
-    # Time Series Line Chart
-    with st.beta_container():
-        st.write("""
-        ### Closing Price
-        """)
-        nearest = alt.selection(type='single', nearest=True, on='mouseover', fields=['Date'], empty='none')
-
-        line = alt.Chart(tickerDf).mark_line(interpolate='basis').encode(
-            x=alt.X("Date", axis=alt.Axis(title='')),
-            y=alt.X('Close', axis=alt.Axis(title='')),
-            color=alt.Color('Year'),
-            tooltip=['Ticker', 'Date', 'Close']
-        )
+def get_similar_stocks(symbol):
+    # Nearest neighbours by return co-movement and fundamentals across the whole universe
+    expander_bar = st.beta_expander("Similar Stocks")
+    try:
+        similar = peers.similar_stocks(symbol)
+    except (IOError, OSError):
+        expander_bar.text('Similar stocks need the returns matrix. Run `python returns_matrix.py` to build it.')
+        return None
+    if similar.empty:
+        expander_bar.text('{} is not in the returns matrix yet.'.format(symbol))
+        return None
 
-        selectors = alt.Chart(tickerDf).mark_point().encode(
-            x="Date",
-            opacity=alt.value(0),
-        ).add_selection(
-            nearest
-        )
+    labels = get_data()[['Symbol', 'Name', 'Sector', 'Industry']].drop_duplicates('Symbol')
+    similar = similar.merge(labels, on='Symbol', how='left')
+    similar['Similarity'] = similar['Similarity'].round(3)
+    expander_bar.dataframe(similar[['Symbol', 'Name', 'Sector', 'Industry', 'Similarity']])
 
-        points = line.mark_point().encode(
-            opacity=alt.condition(nearest, alt.value(1), alt.value(0))
-        )
 
-        text = line.mark_text(align='center', dx=5, dy=-5).encode(
-            text=alt.condition(nearest, 'Close', alt.value(' '))
-        )
+def get_options(symbol, spot):
+    # Nothing is requested from the provider until the panel is switched on
+    if not st.checkbox('Show Options Chain'):
+        return None
 
-        rules = alt.Chart(tickerDf).mark_rule(color='gray').encode(
-            x="Date",
-        ).transform_filter(
-            nearest
-        )
-
-        # Put the five layers into a chart and bind the data
-        chart = alt.layer(
-            line, selectors, points, rules, text
-            ).interactive()
-
-        st.altair_chart(chart, use_container_width=True)
-        
-    # Time Series Volume Chart
-    with st.beta_container():
-        st.write("""
-        ### Volume
-        """)
-        nearest = alt.selection(type='single', nearest=True, on='mouseover', fields=['Date'], empty='none')
-
-        bar = alt.Chart(tickerDf).mark_bar(interpolate='basis').encode(
-            x=alt.X("Date", axis=alt.Axis(title='')),
-            y=alt.X('Volume', axis=alt.Axis(format='#', title='')),
-            color=alt.Color('Year'),
-            tooltip=['Ticker', 'Date', 'Year', 'Volume']
-        )
+    try:
+        expirations = options_chain.get_expirations(symbol)
+    except Exception:
+        expirations = []
+    if not expirations:
+        st.text('No listed options for {}.'.format(symbol))
+        return None
+
+    expiry = st.selectbox('Expiration', expirations)
+    try:
+        chain = options_chain.get_chain(symbol, expiry)
+    except Exception:
+        st.warning('The options chain for {} expiring {} could not be loaded. Try again later.'.format(symbol, expiry))
+        return None
 
-        selectors = alt.Chart(tickerDf).mark_point().encode(
-            x="Date",
-            opacity=alt.value(0),
-        ).add_selection(
-            nearest
-        )
+    summary = options_chain.open_interest_summary(chain)
+    st.markdown('''
+    Call OI: `{call_oi}` | Put OI: `{put_oi}` | Put/Call OI: `{ratio}` | Max Pain: `{max_pain}`
+    '''.format(call_oi=summary['Call OI'], put_oi=summary['Put OI'], ratio=summary['Put/Call OI'],
+               max_pain=summary['Max Pain']))
+
+    smile = options_chain.iv_smile(chain, spot if isinstance(spot, (int, float)) else None)
+    col1, col2 = st.beta_columns(2)
+    col1.altair_chart(alt.Chart(smile).mark_line(point=True).encode(
+        x=alt.X('strike', axis=alt.Axis(title='Strike')),
+        y=alt.Y('impliedVolatility', axis=alt.Axis(title='Implied Volatility', format='%')),
+        color='type',
+        tooltip=['type', 'strike', 'impliedVolatility', 'openInterest']
+    ).interactive(), use_container_width=True)
+    col2.altair_chart(alt.Chart(chain).mark_bar().encode(
+        x=alt.X('strike', axis=alt.Axis(title='Strike')),
+        y=alt.Y('openInterest', axis=alt.Axis(title='Open Interest')),
+        color='type',
+        tooltip=['type', 'strike', 'openInterest', 'volume']
+    ).interactive(), use_container_width=True)
+
+    st.dataframe(chain)
+
+
+def get_financial_statements(symbol):
+    # Served from the local statement store. The provider is only asked when a new filing period is due
+    if not st.checkbox('Show Financial Statements'):
+        return None
+
+    store = financials.load_statements(symbol)
+    col1, col2 = st.beta_columns(2)
+    statement = col1.radio('Statement', ['Income Statement', 'Balance Sheet', 'Cash Flow'])
+    frequency = col2.radio('Frequency', ['Quarterly', 'Annual'])
+
+    periods = store['statements'].get((statement, frequency))
+    if periods is None or periods.empty:
+        st.text('No {} {} data for {}.'.format(frequency.lower(), statement.lower(), symbol))
+        return None
+    table = periods.sort_index(ascending=False).T
+    table.columns = [c.strftime('%Y-%m-%d') for c in table.columns]
+    st.dataframe(table)
+
+    metrics = financials.derived_metrics(store, frequency)
+    if metrics.empty:
+        return None
+    margins = metrics.drop(columns=['Revenue', 'Free Cash Flow'], errors='ignore').reset_index()
+    margins = margins.rename(columns={'index': 'Period'}).melt('Period', var_name='Metric', value_name='Value').dropna()
+    st.altair_chart(alt.Chart(margins).mark_line(point=True).encode(
+        x=alt.X('Period', axis=alt.Axis(title='')),
+        y=alt.Y('Value', axis=alt.Axis(title='', format='%')),
+        color='Metric',
+        tooltip=['Period', 'Metric', alt.Tooltip('Value', format='.2%')]
+    ), use_container_width=True)
+
+
+def get_risk_metrics(symbol):
+    # Risk metrics computed locally from cached history against the S&P 500
+    expander_bar = st.beta_expander("Risk Metrics")
+    with expander_bar.beta_container():
+        window = expander_bar.selectbox('Window (trading days)', risk_metrics.WINDOWS, index=len(risk_metrics.WINDOWS) - 1)
+        try:
+            metrics, rolling = risk_metrics.compute_risk_metrics(symbol, window)
+        except Exception:
+            expander_bar.text('Not enough price history to compute risk metrics.')
+            return None
 
-        points = bar.mark_point().encode(
-            opacity=alt.condition(nearest, alt.value(1), alt.value(0))
+        expander_bar.markdown("""
+            |  | |
+            | :- | :- | :- |
+            | Beta (vs S&P 500) | `{beta}`
+            | Volatility (annualised) | `{volatility}%`
+            | Max Drawdown | `{drawdown}%`
+            | Sharpe Ratio | `{sharpe}`
+            | Sortino Ratio | `{sortino}`
+            | 1 Day VaR (95%) | `{var_95}%`
+            | 1 Day VaR (99%) | `{var_99}%`
+            """.format(beta=round(metrics['Beta'],2), volatility=round(metrics['Volatility']*100,2),
+                        drawdown=round(metrics['Max Drawdown']*100,2), sharpe=round(metrics['Sharpe'],2),
+                        sortino=round(metrics['Sortino'],2), var_95=round(metrics['VaR 95%']*100,2),
+                        var_99=round(metrics['VaR 99%']*100,2))
         )
 
-        text = bar.mark_text(align='center', dx=5, dy=-5).encode(
-            text=alt.condition(nearest, 'Volume', alt.value(' '))
-        )
+        rolling = rolling.reset_index().rename(columns={'index': 'Date'}).melt('Date', var_name='Metric', value_name='Value')
+        chart = alt.Chart(rolling).mark_line().encode(
+            x=alt.X('Date', axis=alt.Axis(title='')),
+            y=alt.Y('Value', axis=alt.Axis(title='')),
+            color='Metric',
+            tooltip=['Date', 'Metric', 'Value']
+        ).interactive()
+        expander_bar.altair_chart(chart, use_container_width=True)
+
+
+def get_intraday(symbol, interval):
+    # Draw the intraday charts once from the ring buffer. Later bars are appended with add_rows
+    buffer = intraday.poll(symbol, interval)
+    bars = buffer.since(completed_only=True)
+
+    st.write("""
+    ### Intraday Price ({interval})
+    """.format(interval=interval))
+    last_price = st.empty()
+    price_chart = st.altair_chart(alt.Chart(bars).mark_line().encode(
+        x=alt.X('Date', axis=alt.Axis(title='')),
+        y=alt.Y('Close', axis=alt.Axis(title=''), scale=alt.Scale(zero=False)),
+        tooltip=['Date', 'Open', 'High', 'Low', 'Close']
+    ), use_container_width=True)
+
+    st.write("""
+    ### Intraday Volume ({interval})
+    """.format(interval=interval))
+    volume_chart = st.altair_chart(alt.Chart(bars).mark_bar().encode(
+        x=alt.X('Date', axis=alt.Axis(title='')),
+        y=alt.Y('Volume', axis=alt.Axis(format='#', title='')),
+        tooltip=['Date', 'Volume']
+    ), use_container_width=True)
+
+    state = {'last_seen': bars['Date'].iloc[-1].value if len(bars) else None}
+
+    def update():
+        latest = intraday.poll(symbol, interval).since(state['last_seen'])
+        if len(latest):
+            last_price.text('Last: {} at {}'.format(round(latest['Close'].iloc[-1], 2), latest['Date'].iloc[-1]))
+
+        # Only completed bars go to the charts, the forming bar would otherwise be appended twice
+        completed = latest.iloc[:-1]
+        if len(completed):
+            price_chart.add_rows(completed)
+            volume_chart.add_rows(completed)
+            state['last_seen'] = completed['Date'].iloc[-1].value
+
+    return update
+
+
+def get_live_quote(symbol, summary, technical_placeholder, holdings_placeholder):
+    # Subscribe to the shared quote poller and re-render the Ticker Summary tables when a new quote lands.
+    # Returns the updater and the subscription token. One subscription per browser session, replaced when the symbol changes instead of piling up on reruns
+    poller = quotes.get_poller()
+    ctx = get_report_ctx()
+    token = poller.subscribe(symbol, session=ctx.session_id if ctx else None)
+    state = {'version': None}
+
+    def update():
+        poller.renew(token)
+        quote, version = poller.latest(symbol)
+        if quote is None or version == state['version']:
+            return
+        state['version'] = version
+
+        for key, field in [('price', 'regularMarketPrice'), ('previous_close', 'regularMarketPreviousClose'),
+                           ('high', 'regularMarketDayHigh'), ('low', 'regularMarketDayLow')]:
+            if quote.get(field) is not None:
+                summary[key] = round(quote[field], 2)
+        if quote.get('regularMarketVolume') is not None:
+            summary['volume'] = quote['regularMarketVolume']
+        technical_placeholder.markdown(TECHNICAL_TABLE.format(**summary))
+        holdings_placeholder.markdown(HOLDINGS_TABLE.format(**summary))
+
+    return update, token
+
+
+def stream_updates(updaters, subscriptions=()):
+    # Run every live updater each time the quote poller publishes, until the user changes a widget or leaves.
+    # Streamlit only stops or reruns a script at its next st call, so the status line is rewritten on every
+    # pass, at least every STATUS_INTERVAL seconds, whether or not anything new arrived
+    poller = quotes.get_poller()
+    status = st.sidebar.empty()
+    version = None
+    try:
+        while True:
+            for update in updaters:
+                update()
+            status.text('Live updates on, last checked {}'.format(time.strftime('%H:%M:%S')))
+            version = poller.wait(version, timeout=STATUS_INTERVAL)
+    finally:
+        for token in subscriptions:
+            poller.unsubscribe(token)
+
+
+def get_yearly_statistics(symbol, start_date, end_date):
+    # Per-year numbers to go with the charts, which are all coloured by Year
+    expander_bar = st.beta_expander("Yearly Performance")
+    try:
+        yearly = risk_metrics.yearly_statistics(symbol)
+    except Exception:
+        expander_bar.text('Yearly statistics are not available for this ticker.')
+        return None
 
-        rules = alt.Chart(tickerDf).mark_rule(color='gray').encode(
-            x="Date",
-        ).transform_filter(
-            nearest
-        )
+    yearly = yearly[(yearly.index >= start_date.year) & (yearly.index <= end_date.year)].copy()
+    for column in ['Return', 'Volatility', 'Max Drawdown', 'Best Day', 'Worst Day']:
+        yearly[column] = (yearly[column] * 100).round(2)
+    yearly['Avg Volume'] = yearly['Avg Volume'].round(0)
+    yearly = yearly.rename(columns={c: c + ' (%)' for c in ['Return', 'Volatility', 'Max Drawdown', 'Best Day', 'Worst Day']})
+    expander_bar.dataframe(yearly.sort_index(ascending=False))
 
-        # Put the five layers into a chart and bind the data
-        chart = alt.layer(
-            bar, selectors, points, rules, text
-            ).interactive()
 
-        st.altair_chart(chart, use_container_width=True)
-    
+def get_visualizations(tickerDf):
+    # Specs are compiled once per process, only the data changes between tickers. The chart frame is built
+    # from the cached compact bars here and dropped once the charts are sent
+    data = charts.chart_data(tickerDf)
+    for title, spec in charts.chart_specs():
+        with telemetry.span('render', section=title), st.beta_container():
+            st.write("""
+            ### {title}
+            """.format(title=title))
+            st.vega_lite_chart(spec=dict(spec, datasets={charts.DATASET: data}), use_container_width=True)
+
+
+def get_watchlist(ticker_list):
+    st.write("""
+    ### Watchlist
+    Six months of closing prices for every ticker on the watchlist, with the last close and daily change.
+    """)
+    saved = watchlist.load_watchlist()
+    symbols = st.multiselect('Tickers', sorted(set(ticker_list['Symbol'].dropna()) | set(saved)), default=saved)
+    if symbols != saved:
+        watchlist.save_watchlist(symbols)
+    if not symbols:
+        return None
 
-    # Scatter Flot
-    with st.beta_container():
-        st.write("""
-        ### Volume x Price
-        """)
-        scatter_chart = st.altair_chart(
-            alt.Chart(tickerDf).mark_circle(size=60).encode(
-                x=alt.X("Volume", axis=alt.Axis(title='')),
-                y=alt.X('Close', axis=alt.Axis(title='')),
-                color='Year',
-                tooltip=['Ticker', 'Date', 'Year', 'Volume', 'Close']
-        ), use_container_width=True)
-
-
-    # Candlesticks OHLC
-    with st.beta_container():
-        st.write("""
-        ### Candlesticks (OHLC)
-        """)
-        base = alt.Chart(tickerDf).encode(
-        alt.X('Date', axis=alt.Axis(labelAngle=0, title='')),
-        color=alt.condition("datum.Open <= datum.Close",alt.value("#06982d"), alt.value("#ae1325")),
-        tooltip=['Ticker', 'Date', 'Open', 'High', 'Low', 'Close']
-        )
+    try:
+        lines, summary = watchlist.sparklines(symbols)
+    except (IOError, OSError):
+        st.warning('The watchlist needs the returns matrix. Run `python returns_matrix.py` to build it.')
+        return None
+
+    # One faceted chart for the whole grid instead of a chart per ticker
+    chart = alt.Chart(lines).mark_line(strokeWidth=1.5).encode(
+        x=alt.X('Date', axis=None),
+        y=alt.Y('Close', axis=None, scale=alt.Scale(zero=False)),
+        tooltip=['Date', 'Close']
+    ).properties(width=180, height=60).facet(
+        facet=alt.Facet('Label', title=None, header=alt.Header(labelFontSize=12)),
+        columns=4
+    ).resolve_scale(y='independent')
+    st.altair_chart(chart)
+
+    missing = sorted(set(symbols) - set(summary['Symbol']))
+    if missing:
+        st.text('Not in the returns matrix yet: {}'.format(', '.join(missing)))
+
+
+def get_market_overview(ticker_list):
+    st.write("""
+    ### Market Overview
+    Performance by sector and industry, weighted by market cap. Box size is market cap, colour is return.
+    """)
+    try:
+        industries, sectors = market_overview.sector_performance(ticker_list)
+    except (IOError, OSError):
+        st.warning('No returns matrix found. Run `python returns_matrix.py` to build it from the local history store.')
+        return None
+
+    period = st.radio('Period', market_overview.PERIODS)
+
+    # Two level treemap: sectors with their industries nested inside
+    fig = go.Figure(go.Treemap(
+        ids=list(sectors['Sector']) + list(industries['Sector'] + ' / ' + industries['Industry']),
+        labels=list(sectors['Sector']) + list(industries['Industry']),
+        parents=[''] * len(sectors) + list(industries['Sector']),
+        values=list(sectors['Market Cap']) + list(industries['Market Cap']),
+        branchvalues='total',
+        marker=dict(colors=list(sectors[period] * 100) + list(industries[period] * 100), colorscale='RdYlGn', cmid=0,
+                    colorbar=dict(title='%')),
+        hovertemplate='<b>%{label}</b><br>Return: %{color:.2f}%<br>Market Cap: %{value:,.0f}<extra></extra>',
+    ))
+    fig.update_layout(margin=dict(t=0, l=0, r=0, b=0), height=600)
+    st.plotly_chart(fig, use_container_width=True)
+
+    table = sectors.sort_values(period, ascending=False).copy()
+    for column in market_overview.PERIODS:
+        table[column] = (table[column] * 100).round(2)
+    st.dataframe(table.set_index('Sector'))
+
+    st.write("""
+    ### Unusual Activity
+    Latest session ranked by volume z-score (log volume vs the prior {window} days) and opening gap vs recent volatility.
+    """.format(window=anomalies.WINDOW))
+    ranked = anomalies.scan().head(25).merge(ticker_list[['Symbol', 'Name', 'Sector']].drop_duplicates('Symbol'),
+                                              on='Symbol', how='left')
+    for column in ['Gap', 'Return']:
+        ranked[column] = (ranked[column] * 100).round(2)
+    st.dataframe(ranked[['Symbol', 'Name', 'Sector', 'Date', 'Volume', 'Volume Z', 'Gap', 'Gap Z', 'Return', 'Score']])
+
+
+@st.cache(allow_output_mutation=True, max_entries=1)
+def load_screener(version):
+    # version is the snapshot file's modification time, so a new batch run invalidates the cached index
+    table = screener.load_snapshots()
+    return None if table is None else screener.Screener(table)
+
+
+def get_screener():
+    st.write("""
+    ### Stock Screener
+    Filter the whole NASDAQ list on the fundamentals shown in the Ticker Summary. Percent fields are entered as percentages (3 = 3%).
+    """)
 
-        chart = alt.layer(
-            base.mark_rule().encode(alt.Y('Low', title='', scale=alt.Scale(zero=False)), 
-                                    alt.Y2('High')),
-            base.mark_bar().encode(alt.Y('Open', title=''), 
-                                    alt.Y2('Close')),
-        ).interactive()
-        st.altair_chart(chart, use_container_width=True)
+    try:
+        version = os.path.getmtime(data_store.cache_path(screener.SNAPSHOT_FILE))
+    except OSError:
+        version = None
+    screen = load_screener(version) if version else None
+    if screen is None:
+        st.warning('No snapshot table found. Run `python screener.py` to collect fundamentals for the universe.')
+        return None
+
+    sectors = sorted(screen.table['Sector'].dropna().unique())
+    selected_sectors = st.multiselect('Sector', sectors)
+
+    conditions = []
+    for i in range(3):
+        col1, col2, col3 = st.beta_columns([3, 1, 2])
+        field = col1.selectbox('Metric', ['-'] + data_store.SNAPSHOT_FIELDS, key='screen_field_%s' % i)
+        op = col2.selectbox('Operator', list(screener.OPERATORS), key='screen_op_%s' % i)
+        value = col3.number_input('Value', value=0.0, key='screen_value_%s' % i)
+        if field != '-':
+            conditions.append((field, op, value))
+
+    col1, col2, col3 = st.beta_columns([3, 1, 2])
+    sort_by = col1.selectbox('Sort by', ['-'] + data_store.SNAPSHOT_FIELDS, index=data_store.SNAPSHOT_FIELDS.index('marketCap') + 1)
+    ascending = col2.checkbox('Ascending', value=False)
+    limit = col3.number_input('Max rows', min_value=10, max_value=max(10, len(screen)), value=min(100, max(10, len(screen))), step=10)
+
+    start_query = time.time()
+    results = screen.query(conditions, sectors=selected_sectors, sort_by=None if sort_by == '-' else sort_by,
+                           ascending=ascending, limit=int(limit))
+    st.text('{} rows in {} ms'.format(len(results), round((time.time() - start_query) * 1000, 2)))
+    st.dataframe(results)
+
+
+def get_alerts(symbol):
+    engine = alerts.get_engine(quotes.get_poller())
+
+    if engine.triggered:
+        st.sidebar.subheader('Triggered Alerts')
+        st.sidebar.markdown('\n'.join('- `{}` {}'.format(alert['triggered_at'], alert['message'])
+                                       for alert in list(engine.triggered)[:10]))
+
+    expander_bar = st.sidebar.beta_expander('Price Alerts')
+    kind = expander_bar.selectbox('Alert type', list(alerts.KINDS), format_func=lambda k: {
+        'level': 'Price level', 'ma': 'Moving average', 'avg_volume': 'Volume vs average'}[k])
+    direction = expander_bar.selectbox('Direction', alerts.DIRECTIONS)
+    value = window = multiplier = None
+    if kind == 'level':
+        value = expander_bar.number_input('Price', min_value=0.0, value=0.0)
+    else:
+        window = int(expander_bar.number_input('Days', min_value=2, max_value=500, value=200 if kind == 'ma' else 10))
+    if kind == 'avg_volume':
+        multiplier = expander_bar.number_input('Multiple of average', min_value=0.1, value=3.0)
+    if expander_bar.button('Add alert for {}'.format(symbol)):
+        engine.add_rule(symbol, kind, direction, value=value, window=window, multiplier=multiplier)
+        quotes.get_poller().watch('alerts', engine.symbols())
+
+    for rule in engine.rules_for(symbol):
+        status = 'fired {}'.format(rule['triggered_at']) if rule['triggered_at'] else 'armed'
+        if expander_bar.button('Remove: {} ({})'.format(alerts.describe(rule), status), key='alert_%s' % rule['id']):
+            engine.remove_rule(rule['id'])
+            quotes.get_poller().watch('alerts', engine.symbols())
 
-        fig = go.Figure()
 
 def get_credits():
     st.write("")
@@ -0,0 +1,132 @@
+import contextlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+import memory_cache
+import shared_cache
+
+
+###################################################################################################################
+# Stage Timing
+###################################################################################################################
+
+# Upper bounds in seconds, from a cache read to a slow upstream download
+BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+JSON_LOGS = os.environ.get('STOCK_APP_JSON_LOGS', '1') != '0'
+
+_lock = threading.Lock()
+_stages = {} # (stage, section, cache) -> {'buckets': [...], 'sum': seconds, 'count': n, 'bytes': n}
+
+logger = logging.getLogger('stock_app.spans')
+logger.propagate = False
+if JSON_LOGS and not logger.handlers:
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+
+@contextlib.contextmanager
+def span(stage, **fields):
+    """Time the block as one run of stage.
+
+    Yields a dict the block can fill in: 'cache' ('hit' or 'miss', default 'none'), 'bytes' for the payload
+    size, and any other field for the JSON log line. Duration goes into the stage's latency histogram,
+    labelled by the cache outcome and by the 'section' field when there is one. An exception is logged with the span and re-raised.
+    """
+    record = dict(fields, cache='none', bytes=0)
+    start = time.perf_counter()
+    try:
+        yield record
+    except Exception as e:
+        record['error'] = type(e).__name__
+        raise
+    finally:
+        observe(stage, time.perf_counter() - start, record)
+
+
+def on_miss(record, fetch):
+    # Wrap a cache fill callback so the span is marked a miss when it runs. Spans default to a hit around caches
+    record['cache'] = 'hit'
+
+    def fill(*args, **kwargs):
+        record['cache'] = 'miss'
+        return fetch(*args, **kwargs)
+    return fill
+
+
+def observe(stage, seconds, record):
+    key = (stage, str(record.get('section', '')), record.get('cache', 'none'))
+    with _lock:
+        entry = _stages.get(key)
+        if entry is None:
+            entry = _stages[key] = {'buckets': [0] * len(BUCKETS), 'sum': 0.0, 'count': 0, 'bytes': 0}
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                entry['buckets'][i] += 1
+        entry['sum'] += seconds
+        entry['count'] += 1
+        entry['bytes'] += int(record.get('bytes') or 0)
+    if JSON_LOGS:
+        logger.info(json.dumps(dict(record, ts=round(time.time(), 3), span=stage, ms=round(seconds * 1000, 3)),
+                               default=str))
+
+
+def _labels(**labels):
+    return '{' + ','.join('%s="%s"' % (k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in labels.items()) + '}'
+
+
+def render():
+    """All stage histograms and in-process cache counters in the Prometheus text exposition format."""
+    with _lock:
+        stages = {key: dict(entry, buckets=list(entry['buckets'])) for key, entry in _stages.items()}
+
+    lines = ['# HELP stock_app_stage_seconds Time spent per page stage, by cache outcome.',
+             '# TYPE stock_app_stage_seconds histogram']
+    for (stage, section, cache), entry in sorted(stages.items()):
+        labels = dict(stage=stage, section=section, cache=cache)
+        for bound, count in zip(BUCKETS, entry['buckets']):
+            lines.append('stock_app_stage_seconds_bucket%s %d' % (_labels(**dict(labels, le=bound)), count))
+        lines.append('stock_app_stage_seconds_bucket%s %d' % (_labels(**dict(labels, le='+Inf')), entry['count']))
+        lines.append('stock_app_stage_seconds_sum%s %.6f' % (_labels(**labels), entry['sum']))
+        lines.append('stock_app_stage_seconds_count%s %d' % (_labels(**labels), entry['count']))
+
+    lines += ['# HELP stock_app_stage_bytes_total Payload bytes handled per page stage.',
+              '# TYPE stock_app_stage_bytes_total counter']
+    for (stage, section, cache), entry in sorted(stages.items()):
+        labels = dict(stage=stage, section=section, cache=cache)
+        lines.append('stock_app_stage_bytes_total%s %d' % (_labels(**labels), entry['bytes']))
+
+    caches = memory_cache.stats()
+    for column, name, kind in [('Bytes', 'stock_app_cache_bytes', 'gauge'), ('Entries', 'stock_app_cache_entries', 'gauge'),
+                               ('Hits', 'stock_app_cache_hits_total', 'counter'),
+                               ('Misses', 'stock_app_cache_misses_total', 'counter'),
+                               ('Evictions', 'stock_app_cache_evictions_total', 'counter')]:
+        lines.append('# TYPE %s %s' % (name, kind))
+        for _, row in caches.iterrows():
+            lines.append('%s%s %d' % (name, _labels(cache=row['Cache']), row[column]))
+    lines.append('# TYPE stock_app_cache_budget_bytes gauge')
+    lines.append('stock_app_cache_budget_bytes %d' % memory_cache.BUDGET)
+    lines.append('# TYPE stock_app_shared_cache_lock_timeouts_total counter')
+    lines.append('stock_app_shared_cache_lock_timeouts_total %d' % shared_cache.lock_timeouts)
+    return '\n'.join(lines) + '\n'
+
+
+_written = {'at': 0.0}
+
+
+def write_textfile(path, min_interval=10):
+    # Snapshot for the node_exporter textfile collector. Written at most every min_interval seconds
+    now = time.time()
+    if now - _written['at'] < min_interval:
+        return False
+    _written['at'] = now
+    tmp = '%s.%d.tmp' % (path, threading.get_ident())
+    with open(tmp, 'w') as f:
+        f.write(render())
+    os.replace(tmp, path)
+    return True
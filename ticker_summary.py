@@ -0,0 +1,129 @@
+import string
+
+
+###################################################################################################################
+# Ticker Summary Values
+###################################################################################################################
+
+# (name, info key) for the company profile. Missing values show as 'N/A'
+PROFILE_FIELDS = [
+    ('logo', 'logo_url'),
+    ('company_name', 'longName'),
+    ('country', 'country'),
+    ('sector', 'sector'),
+    ('industry', 'industry'),
+    ('market', 'market'),
+    ('employees', 'fullTimeEmployees'),
+    ('website', 'website'),
+]
+
+# (name, info key, scale) for the Ticker Summary tables. scale None shows the raw value, otherwise the value is
+# multiplied by scale and rounded to 2 decimals. Missing values show as an empty string
+SUMMARY_FIELDS = [
+    ('price', 'regularMarketPrice', None),
+    ('previous_close', 'previousClose', 1),
+    ('high', 'regularMarketDayHigh', 1),
+    ('low', 'regularMarketDayLow', 1),
+    ('high_52', 'fiftyTwoWeekHigh', 1),
+    ('low_52', 'fiftyTwoWeekLow', 1),
+    ('change_52', '52WeekChange', 100),
+    ('change_52_snp', 'SandP52WeekChange', 100),
+    ('ma_50', 'fiftyDayAverage', 1),
+    ('ma_200', 'twoHundredDayAverage', 1),
+    ('market_cap', 'marketCap', None),
+    ('beta', 'beta', 1),
+    ('pe_ratio', 'trailingPE', 1),
+    ('eps', 'trailingEps', 1),
+    ('peg_ratio', 'pegRatio', 1),
+    ('price_to_sale', 'priceToSalesTrailing12Months', 1),
+    ('price_to_book', 'priceToBook', 1),
+    ('enterprise_value', 'enterpriseToRevenue', 1),
+    ('ebitda', 'enterpriseToEbitda', 1),
+    ('profit', 'profitMargins', 100),
+    ('net_income', 'netIncomeToCommon', 1),
+    ('payout', 'payoutRatio', 100),
+    ('dividend_rate', 'dividendRate', 1),
+    ('dividend_yield', 'dividendYield', 100),
+    ('forward_eps', 'forwardEps', 1),
+    ('trailing_pe', 'trailingPE', 1),
+    ('forward_pe', 'forwardPE', 1),
+    ('earnings_growth', 'earningsQuarterlyGrowth', 100),
+    ('volume', 'regularMarketVolume', None),
+    ('avg_vol_3mo', 'averageVolume', None),
+    ('avg_vol_10day', 'averageVolume10days', None),
+    ('shares_outstanding', 'sharesOutstanding', None),
+    ('shares_float', 'floatShares', None),
+    ('pct_insiders', 'heldPercentInsiders', 100),
+    ('pct_institutions', 'heldPercentInstitutions', 100),
+    ('shares_short', 'sharesShort', None),
+    ('shares_short_ratio', 'shortRatio', 1),
+    ('short_pct_float', 'shortPercentOfFloat', 100),
+    ('shares_short_pm', 'sharesShortPriorMonth', None),
+]
+
+
+def get_summary(info):
+    # Display values for the ticker page and the batch reports from one `info` payload
+    summary = {}
+    for name, key in PROFILE_FIELDS:
+        value = info.get(key)
+        summary[name] = 'N/A' if value is None and name != 'logo' else value
+
+    for name, key, scale in SUMMARY_FIELDS:
+        try:
+            value = info[key]
+            summary[name] = value if scale is None else round(value * scale, 2)
+        except (KeyError, TypeError):
+            summary[name] = ""
+    return summary
+
+
+###################################################################################################################
+# Data Dictionary
+###################################################################################################################
+
+# Only the Value column changes between tickers
+DATA_DICTIONARY = """
+    All definitions are provided by [Investopedia](https://www.investopedia.com)
+
+    | Attribute | Value | Definition |
+    | :- | :- | :- |
+    | Sector | {sector} | A sector is an area of the economy in which businesses share the same or a related product or service. |
+    | Industry | {industry} | The term industry refers to a series of companies that operate in a similar business sphere, and its categorization is more narrow. |
+    | Country | {country} | The country the company was originated or does business in. |
+    | Market Cap | {market_cap} | Market capitalization refers to the total dollar market value of a company's outstanding shares of stock. Commonly referred to as "market cap," it is calculated by multiplying the total number of a company's outstanding shares by the current market price of one share. |
+    | Beta | {beta} | Beta is a measure of the volatility—or systematic risk—of a security or portfolio compared to the market as a whole.  |    
+    | P/E Ratio | {pe_ratio} | The price-to-earnings ratio (P/E ratio) is the ratio for valuing a company that measures its current share price relative to its per-share earnings (EPS). The price-to-earnings ratio is also sometimes known as the price multiple or the earnings multiple.  |    
+    | EPS | {eps} | Earnings per share (EPS) is calculated as a company's profit divided by the outstanding shares of its common stock. The resulting number serves as an indicator of a company's profitability.  |    
+    | PEG Ratio | {peg_ratio} | The price/earnings to growth ratio (PEG ratio) is a stock's price-to-earnings (P/E) ratio divided by the growth rate of its earnings for a specified time period. The PEG ratio is used to determine a stock's value while also factoring in the company's expected earnings growth, and it is thought to provide a more complete picture than the more standard P/E ratio.  |    
+    | P/S Ratio | {price_to_sale} | The price-to-sales (P/S) ratio is a valuation ratio that compares a company’s stock price to its revenues. It is an indicator of the value that financial markets have placed on each dollar of a company’s sales or revenues.  |    
+    | P/B Ratio | {price_to_book} | Companies use the price-to-book ratio (P/B ratio) to compare a firm's market capitalization to its book value. It's calculated by dividing the company's stock price per share by its book value per share (BVPS).  |    
+    | EV/R | {enterprise_value} | The enterprise value-to-revenue multiple (EV/R) is a measure of the value of a stock that compares a company's enterprise value to its revenue. EV/R is one of several fundamental indicators that investors use to determine whether a stock is priced fairly.  |    
+    | EBITDA/EV | {ebitda} | The EBITDA/EV multiple is a financial valuation ratio that measures a company's return on investment (ROI).   |    
+    | Profit Margin | {profit}  | A metric used to gauge how a company or business makes money. Expressed as percentage, profit margin indicatses how many cents of profit has been generated for each dollar of sale. |    
+    | Net Income | {net_income} | Net income (NI), also called net earnings, is calculated as sales minus cost of goods sold, selling, general and administrative expenses, operating expenses, depreciation, interest, taxes, and other expenses.  |    
+    | Dividend Yield | {dividend_yield} | The dividend yield–displayed as a percentage–is the amount of money a company pays shareholders for owning a share of its stock divided by its current stock price.  |    
+    | Dividend Rate | {dividend_rate} | Dividend rate, expressed as a percentage or yield, is a financial ratio that shows how much a company pays out in dividends each year relative to its stock price.  |    
+    | Payout Ratio | {payout} | The payout ratio, also known as the dividend payout ratio, shows the percentage of a company's earnings paid out as dividends to shareholders.  |    
+    | Forward EPS | {forward_eps} | Forward earnings are an estimate of a company's earnings for upcoming periods. Forward earnings project future revenues, margins, tax rates, and other financial data. |    
+    | Trailing PE | {trailing_pe} | Trailing price-to-earnings (P/E) is a relative valuation multiple that is based on the last 12 months of actual earnings. It is calculated by taking the current stock price and dividing it by the trailing earnings per share (EPS) for the past 12 months.  |    
+    | Forward PE | {forward_pe} | Forward price-to-earnings (forward P/E) is a version of the ratio of price-to-earnings (P/E) that uses forecasted earnings for the P/E calculation.  |    
+    | Earnings Growth | {earnings_growth} | Growth rates are used to express the annual change in a variable as a percentage. Growth rates can be beneficial in assessing a company’s performance and to predict future performance.  |    
+    | Volume | {volume} | Volume is the number of shares of a security traded between its daily open and close. Trading volume, and changes to volume over the course of time, are important inputs for technical traders.  |    
+    | Shares Outstanding | {shares_outstanding} | Shares outstanding refer to a company's stock currently held by all its shareholders, including share blocks held by institutional investors and restricted shares owned by the company’s officers and insiders.  |    
+    | Shares Float | {shares_float} | Floating stock refers to the number of shares a company has available to trade in the open market. To calculate a company's floating stock, subtract its restricted stock and closely held shares from its total number of outstanding shares.  |    
+    | % Held by Insiders | {pct_insiders} | Insiders are a company's officers, directors, relatives, or anyone else with access to key company information before it's made available to the public. By watching the trading activity of corporate insiders and large institutional investors, it's easier to get a sense of a stock's prospects. |    
+    | % Held by Institutions | {pct_institutions} | An institutional investor is a company or organization that invests money on behalf of other people. Mutual funds, pensions, and insurance companies are examples.  |    
+    | Shares Short | {shares_short} | A short, or a short position, is created when a trader sells a security first with the intention of repurchasing it or covering it later at a lower price.   |    
+    | Shares Short Ratio | {shares_short_ratio} | The short Interest ratio is a simple formula that divides the number of shares short in a stock by the stock's average daily trading volume. The short interest ratio is a quick way to see how heavily shorted a stock may be versus its trading volume. |    
+    | Short Percent to Float | {short_pct_float} |  When a company's short interest is high (above 40%), it frequently means a large portion of investors anticipate the shares will go down in value and are looking to profit from the decline or are using the short as a hedge against a possible decline. |    
+    | Shares Short Previous Month | {shares_short_pm} |  The number of shares that were shorted in the previous month. This metric can serves as a market sentiment indicator for investors. |    
+    """
+
+# Literal text and field names of DATA_DICTIONARY, split once so binding a ticker is a single join
+_DICTIONARY_PARTS = [(literal, field) for literal, field, _, _ in string.Formatter().parse(DATA_DICTIONARY)]
+
+
+def data_dictionary(summary):
+    # DATA_DICTIONARY with summary's values bound, same output as DATA_DICTIONARY.format(**summary)
+    return ''.join(literal + ('' if field is None else str(summary[field])) for literal, field in _DICTIONARY_PARTS)
@@ -0,0 +1,71 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import data_store
+import returns_matrix
+
+
+###################################################################################################################
+# Watchlist
+###################################################################################################################
+
+WATCHLIST_FILE = 'watchlist.json'
+DEFAULT_SYMBOLS = ['AAPL', 'MSFT', 'AMZN', 'GOOGL', 'FB', 'TSLA', 'NVDA', 'NFLX']
+SPARKLINE_POINTS = 100
+SPARKLINE_DAYS = 126 # about six months of trading days
+
+
+def load_watchlist():
+    try:
+        with open(data_store.cache_path(WATCHLIST_FILE)) as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return list(DEFAULT_SYMBOLS)
+
+
+def save_watchlist(symbols):
+    path = data_store.cache_path(WATCHLIST_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(list(symbols), f)
+    os.replace(path + '.tmp', path)
+
+
+def downsample_rows(n, points=SPARKLINE_POINTS):
+    # Evenly spaced row positions that always keep the first and last row
+    if n <= points:
+        return np.arange(n)
+    return np.unique(np.linspace(0, n - 1, points).round().astype('int64'))
+
+
+def sparklines(symbols, days=SPARKLINE_DAYS, points=SPARKLINE_POINTS, matrix=None):
+    """Long format sparkline data plus a summary row per symbol, from one read of the close matrix.
+
+    The block for all requested symbols is sliced out of the memory-mapped close matrix in a single read and
+    downsampled to about `points` dates, so the cost barely depends on the number of symbols.
+    """
+    matrix = matrix or returns_matrix.ReturnsMatrix()
+    symbols = [s for s in symbols if s in matrix.index]
+    columns = matrix.columns(symbols)
+    block = np.asarray(matrix.close[-days:][:, columns], dtype='float64')
+    dates = matrix.dates[-days:]
+
+    # Carry the last close forward over days a symbol did not trade, then summarise from the filled block
+    filled = pd.DataFrame(block).ffill().to_numpy()
+    last = filled[-1]
+    previous = filled[-2] if len(filled) > 1 else np.full(len(symbols), np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        change = (last / previous - 1) * 100
+    summary = pd.DataFrame({'Symbol': symbols, 'Last': last.round(2), 'Change %': change.round(2)})
+    summary['Label'] = ['{}  {:.2f}  ({:+.2f}%)'.format(s, p, c) for s, p, c in
+                        zip(summary['Symbol'], summary['Last'], summary['Change %'].fillna(0))]
+
+    rows = downsample_rows(len(dates), points)
+    lines = pd.DataFrame({
+        'Date': np.tile(dates[rows], len(symbols)),
+        'Label': np.repeat(summary['Label'].to_numpy(), len(rows)),
+        'Close': filled[rows].T.ravel(),
+    }).dropna()
+    return lines, summary